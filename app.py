@@ -9,11 +9,16 @@ import pandas as pd
 import io
 import time
 from datetime import datetime
+from typing import Dict, Tuple
 import base64
 
 # Importar nuestras clases de análisis
-from pricing_analyzer import PricingAnalyzer
+from pricing_analyzer import PricingAnalyzer, PRICE_SEGMENT_THRESHOLDS
 from report_generator import ReportGenerator
+from feed_cache import FeedCache
+from segmentation_index import SegmentationIndex
+from olap_cube import OlapCube
+from profiling import RunProfile
 
 # Configuración de la página
 st.set_page_config(
@@ -87,6 +92,353 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Nombres de las dimensiones del cubo en el panel y etiqueta de los valores vacíos
+CUBE_DIMENSION_LABELS = {
+    'Marca': 'Marca',
+    'medida_final': 'Medida',
+    'temporada_limpia': 'Temporada',
+    'vehiculo_final': 'Vehículo',
+    'segmento_quality': 'Segmento de calidad',
+    'category_inferred': 'Categoría',
+    'segmento_precio': 'Segmento de precio'
+}
+MISSING_MEMBER_LABEL = '(sin valor)'
+
+# Límites de la memoización de etapas del análisis
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_ENTRIES = 4
+
+# Tamaño del informe HTML (MB) a partir del cual se avisa al descargarlo
+REPORT_SIZE_WARNING_MB = 5
+
+@st.cache_resource
+def get_feed_cache() -> FeedCache:
+    """Caché en disco de feeds parseados compartida por todas las sesiones"""
+    return FeedCache()
+
+def file_fingerprint(uploaded_file) -> str:
+    """Huella del contenido de un fichero subido, calculada una vez por subida"""
+    fingerprints = st.session_state.setdefault('file_fingerprints', {})
+    if uploaded_file.file_id not in fingerprints:
+        with uploaded_file.getbuffer() as buffer:
+            fingerprints[uploaded_file.file_id] = get_feed_cache().fingerprint(buffer)
+    return fingerprints[uploaded_file.file_id]
+
+def rewind(uploaded_file):
+    """Devuelve el fichero subido al inicio para que los parsers lean sus bytes en streaming"""
+    uploaded_file.seek(0)
+    return uploaded_file
+
+# Vistas previas acotadas: bytes leídos del inicio del fichero y bloques
+# repartidos por el fichero para estimar recuentos sin recorrerlo entero
+PREVIEW_HEAD_BYTES = 64 * 1024
+SAMPLE_BLOCKS = 32
+SAMPLE_BLOCK_BYTES = 64 * 1024
+
+def read_head_lines(uploaded_file, max_bytes: int = PREVIEW_HEAD_BYTES) -> list:
+    """Líneas completas contenidas en los primeros max_bytes del fichero subido"""
+    with uploaded_file.getbuffer() as buffer:
+        head = bytes(buffer[:max_bytes])
+        truncated = len(buffer) > max_bytes
+
+    lines = head.decode('utf-8', errors='ignore').split('\n')
+    # Descartar la última línea si el corte la ha dejado a medias
+    return lines[:-1] if truncated and len(lines) > 1 else lines
+
+def estimate_occurrences(uploaded_file, token: bytes) -> Tuple[int, bool]:
+    """
+    Cuenta las apariciones de token en el fichero subido. En ficheros grandes
+    se cuenta en SAMPLE_BLOCKS bloques equiespaciados y se extrapola al tamaño
+    total. Devuelve (recuento, es_exacto)
+    """
+    with uploaded_file.getbuffer() as buffer:
+        size = len(buffer)
+        sample_size = SAMPLE_BLOCKS * SAMPLE_BLOCK_BYTES
+        if size <= sample_size:
+            return bytes(buffer).count(token), True
+
+        step = (size - SAMPLE_BLOCK_BYTES) // (SAMPLE_BLOCKS - 1)
+        found = sum(
+            bytes(buffer[start:start + SAMPLE_BLOCK_BYTES]).count(token)
+            for start in range(0, step * SAMPLE_BLOCKS, step)
+        )
+    return round(found * size / sample_size), False
+
+def format_count(count: int, exact: bool) -> str:
+    return f"{count:,}" if exact else f"~{count:,} (estimado)"
+
+# Etapas del análisis memoizadas por la huella de sus entradas. Los argumentos
+# con guion bajo inicial no forman parte de la clave de caché de Streamlit: medir
+# la memoria no cambia el resultado, así que no obliga a repetir el análisis
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def parse_csv_stage(csv_fingerprint: str, _trace_memory: bool, _csv_file) -> Tuple[pd.DataFrame, str, RunProfile]:
+    analyzer = PricingAnalyzer(profile=RunProfile(_trace_memory))
+    df = analyzer.parse_competitiveness_csv(rewind(_csv_file))
+    return df, analyzer.date_range, analyzer.profile
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def parse_feed_stage(feed_fingerprint: str, csv_fingerprint: str, _trace_memory: bool, _xml_file,
+                     _competitiveness_data: pd.DataFrame) -> Tuple[pd.DataFrame, RunProfile]:
+    # Solo se extraen los items del feed cuyo ID aparece en el CSV; se conservan todas
+    # sus columnas porque el dataset enriquecido es el que se exporta a CSV
+    analyzer = PricingAnalyzer(feed_cache=get_feed_cache(), profile=RunProfile(_trace_memory))
+    analyzer.competitiveness_data = _competitiveness_data
+    # La huella del feed (file_fingerprint) es también su clave en la caché de disco
+    feed_data = analyzer.parse_product_feed_xml(rewind(_xml_file),
+                                                id_filter=analyzer.competitiveness_id_set(),
+                                                content_key=feed_fingerprint)
+    return feed_data, analyzer.profile
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def analysis_stage(csv_fingerprint: str, feed_fingerprint: str, _trace_memory: bool,
+                   _csv_file, _xml_file) -> Tuple[pd.DataFrame, Dict, str, RunProfile]:
+    competitiveness_data, date_range, csv_profile = parse_csv_stage(csv_fingerprint, _trace_memory, _csv_file)
+    feed_data, feed_profile = parse_feed_stage(feed_fingerprint, csv_fingerprint, _trace_memory, _xml_file,
+                                               competitiveness_data)
+
+    profile = RunProfile(_trace_memory).extend(csv_profile).extend(feed_profile)
+    analyzer = PricingAnalyzer(profile=profile)
+    analyzer.competitiveness_data = competitiveness_data
+    analyzer.feed_data = feed_data
+    analyzer.date_range = date_range
+
+    enriched_data = analyzer.enrich_data()
+    metrics = analyzer.calculate_metrics()
+    return enriched_data, metrics, date_range, profile
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def report_stage(csv_fingerprint: str, feed_fingerprint: str, _trace_memory: bool, embed_products: bool,
+                 _enriched_data: pd.DataFrame, _metrics: Dict, date_range: str) -> Tuple[str, RunProfile]:
+    generator = ReportGenerator(profile=RunProfile(_trace_memory), embed_products=embed_products)
+    return generator.generate_html_report(_metrics, date_range, _enriched_data), generator.profile
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def export_csv_stage(csv_fingerprint: str, feed_fingerprint: str, _enriched_data: pd.DataFrame,
+                     report_date: str) -> bytes:
+    return _enriched_data.assign(report_date=report_date).to_csv(index=False).encode('utf-8')
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def segmentation_stage(csv_fingerprint: str, feed_fingerprint: str, _enriched_data: pd.DataFrame) -> SegmentationIndex:
+    return SegmentationIndex(_enriched_data)
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cube_stage(csv_fingerprint: str, feed_fingerprint: str, _enriched_data: pd.DataFrame) -> OlapCube:
+    return OlapCube(_enriched_data)
+
+def run_analysis(inputs: Tuple[str, str], csv_file, xml_file, trace_memory: bool = False,
+                 embed_products: bool = False) -> Tuple[pd.DataFrame, Dict, str, RunProfile]:
+    """
+    Ejecuta (o recupera de la caché) el análisis completo de los ficheros subidos
+    y devuelve los datos enriquecidos, las métricas, el informe HTML y las
+    medidas de cada etapa (las de su primera ejecución si vienen de la caché).
+    Con embed_products el informe incluye todos los productos
+    """
+    enriched_data, metrics, date_range, analysis_profile = analysis_stage(*inputs, trace_memory, csv_file, xml_file)
+    html_report, report_profile = report_stage(*inputs, trace_memory, embed_products, enriched_data, metrics,
+                                               date_range)
+    profile = RunProfile(trace_memory).extend(analysis_profile).extend(report_profile)
+    return enriched_data, metrics, html_report, profile
+
+def render_results(inputs: Tuple[str, str], enriched_data: pd.DataFrame, metrics: Dict,
+                   html_report: str, profile: RunProfile, generated_at: datetime):
+    """Muestra el resumen, las descargas y la vista previa de un análisis"""
+    timestamp = generated_at.strftime("%Y-%m-%d_%H-%M-%S")
+    report_date = generated_at.strftime("%Y-%m-%d")
+
+    st.success("✅ ¡Análisis completado con éxito!")
+
+    # Mostrar resumen ejecutivo
+    st.header("📈 Resumen Ejecutivo")
+
+    # KPIs principales
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-value">{metrics['globales']['total_productos']:,}</div>
+            <div class="kpi-label">Productos Analizados</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-value">{metrics['globales']['total_clicks']:,}</div>
+            <div class="kpi-label">Clics Totales</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        price_diff = metrics['globales']['price_diff_stats']['media_ponderada']
+        price_class = "price-positive" if price_diff < -1 else "price-negative" if price_diff > 1 else "price-neutral"
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-value {price_class}">{price_diff:+.2f}%</div>
+            <div class="kpi-label">Diff. Precio Media</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col4:
+        quality_pct = metrics['calidad_datos']['porcentaje_match']
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-value">{quality_pct:.1f}%</div>
+            <div class="kpi-label">Calidad de Datos</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    # Métricas clave
+    st.header("🎯 Métricas Clave")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        segments = metrics['globales']['segmento_distribucion']
+        baratos_pct = segments.get('MUCHO_MAS_BARATO', 0) + segments.get('BARATO', 0)
+        caros_pct = segments.get('CARO', 0) + segments.get('MUCHO_MAS_CARO', 0)
+
+        st.metric("📉 Posición Global",
+                f"{baratos_pct:.1f}% más baratos vs {caros_pct:.1f}% más caros")
+        st.metric("⚠️ Productos de Riesgo",
+                f"{len(metrics['productos_riesgo'])}")
+        st.metric("💰 Oportunidades",
+                f"{len(metrics['oportunidades'])}")
+
+    with col2:
+        if metrics['marcas'] is not None and len(metrics['marcas']) > 0:
+            top_brand = metrics['marcas'].iloc[0]
+            st.metric("🏆 Marca Principal",
+                    f"{top_brand['marca']} ({top_brand['clics_totales']:,} clics)")
+
+        if metrics['temporadas'] is not None and len(metrics['temporadas']) > 0:
+            top_temporada = metrics['temporadas'].iloc[0]
+            st.metric("🌤️ Temporada Principal",
+                    f"{top_temporada['temporada']} ({top_temporada['clics_totales']:,} clics)")
+
+    render_segmentation(inputs, enriched_data)
+    render_cube_explorer(inputs, enriched_data)
+
+    # Descarga del informe
+    st.header("📥 Descargar Informe Completo")
+
+    # Crear enlace de descarga
+    filename = f"informe_competitividad_{timestamp}.html"
+
+    st.markdown(f"""
+    <div class="success-box">
+        <h4>📋 Informe HTML generado: {filename}</h4>
+        <p>✅ Incluye análisis completo por marcas, medidas, temporadas y vehículos</p>
+        <p>✅ Tablas interactivas y gráficos dinámicos</p>
+        <p>✅ Recomendaciones accionables y conclusiones clave</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    report_size_mb = len(html_report.encode('utf-8')) / 1024 ** 2
+    if report_size_mb >= REPORT_SIZE_WARNING_MB:
+        st.warning(f"⚠️ El informe ocupa {report_size_mb:.1f} MB; puede tardar en abrirse en el navegador")
+
+    # Botón de descarga informe HTML
+    b64 = base64.b64encode(html_report.encode()).decode()
+    href = f'<a href="data:file/html;base64,{b64}" download="{filename}">📥 DESCARGAR INFORME HTML</a>'
+    st.markdown(href, unsafe_allow_html=True)
+
+    # ---------------------------------------------------------
+    # NUEVO: Generación de CSV para registro
+    # ---------------------------------------------------------
+    st.markdown("### 💾 Exportar Datos (CSV)")
+
+    # Generar CSV con fecha de reporte para histórico
+    csv_data = export_csv_stage(*inputs, enriched_data, report_date)
+    csv_filename = f"registro_precios_{timestamp}.csv"
+
+    st.download_button(
+        label="📥 DESCARGAR CSV DE REGISTRO",
+        data=csv_data,
+        file_name=csv_filename,
+        mime='text/csv',
+        help="Descarga el dataset completo con fecha para histórico"
+    )
+    # ---------------------------------------------------------
+
+    render_performance(profile)
+
+    # Vista previa del informe
+    with st.expander("👁️ Vista previa del informe HTML", expanded=True):
+        st.components.v1.html(html_report, height=1000, scrolling=True)
+
+def render_performance(profile: RunProfile):
+    """Tiempo, CPU, filas y pico de memoria de cada etapa del análisis"""
+    with st.expander("⏱️ Rendimiento del análisis"):
+        st.caption(f"Tiempo total de las etapas: {profile.total_wall_s:.2f}s")
+        summary = profile.summary()
+        # Las etapas recuperadas de la caché conservan las medidas de su primera ejecución
+        if summary['pico_memoria_mb'].isna().all():
+            summary = summary.drop(columns='pico_memoria_mb')
+        st.dataframe(summary.round(3), use_container_width=True, hide_index=True)
+
+def render_segmentation(inputs: Tuple[str, str], enriched_data: pd.DataFrame):
+    """
+    Permite mover los umbrales de los segmentos de precio y recalcula la
+    distribución de clics desde el índice precalculado, sin reprocesar
+    """
+    st.header("🎚️ Segmentos de Precio")
+
+    low, cheap, aligned, expensive = PRICE_SEGMENT_THRESHOLDS
+    col1, col2 = st.columns(2)
+    with col1:
+        cheap_bounds = st.slider("Umbrales más barato (%)", -30.0, 0.0, (float(low), float(cheap)), step=0.5,
+                                 help="Muy barato por debajo del primero; barato hasta el segundo")
+    with col2:
+        expensive_bounds = st.slider("Umbrales más caro (%)", 0.0, 30.0, (float(aligned), float(expensive)), step=0.5,
+                                     help="Caro desde el primero; muy caro desde el segundo")
+
+    index = segmentation_stage(*inputs, enriched_data)
+    thresholds = cheap_bounds + expensive_bounds
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**% de clics por segmento**")
+        st.bar_chart(pd.Series(index.distribution(thresholds), name='% clics'))
+    with col2:
+        st.markdown("**% de clics de cada marca por segmento**")
+        st.dataframe(index.brand_shares(thresholds).head(15), use_container_width=True)
+
+def render_cube_explorer(inputs: Tuple[str, str], enriched_data: pd.DataFrame):
+    """
+    Cortes y agregaciones interactivas (p. ej. marca × medida de una
+    temporada) respondidas desde el cubo precalculado
+    """
+    st.header("🔎 Exploración por Dimensiones")
+
+    cube = cube_stage(*inputs, enriched_data)
+    label_of = lambda dim: CUBE_DIMENSION_LABELS.get(dim, dim)
+
+    by = st.multiselect("Agrupar por", cube.dimensions, default=cube.dimensions[:1], format_func=label_of)
+
+    filters = {}
+    with st.expander("Filtros"):
+        columns = st.columns(2)
+        for i, dim in enumerate(cube.dimensions):
+            options = [MISSING_MEMBER_LABEL if value is None else value for value in cube.members[dim]]
+            with columns[i % 2]:
+                selected = st.multiselect(label_of(dim), options, key=f"cube_filter_{dim}")
+            if selected:
+                filters[dim] = [None if value == MISSING_MEMBER_LABEL else value for value in selected]
+
+    result = cube.query(by, filters)
+    if by:
+        result[by] = result[by].fillna(MISSING_MEMBER_LABEL)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Clics en la selección", f"{result['clics_totales'].sum():,}")
+    with col2:
+        st.metric("Productos en la selección", f"{result['productos'].sum():,}")
+
+    st.dataframe(result.rename(columns=label_of).round(2), use_container_width=True, hide_index=True)
+
 def main():
     # Header principal
     st.markdown("""
@@ -136,6 +488,16 @@ def main():
         - Heroku (con tier gratuito)
         """)
 
+        st.markdown("---")
+
+        trace_memory = st.checkbox("Medir pico de memoria por etapa", value=False,
+                                   help="Activa tracemalloc durante el análisis; el procesamiento es más lento. "
+                                        "Las etapas ya cacheadas muestran las medidas de su primera ejecución")
+        embed_products = st.checkbox("Incluir todos los productos en el informe", value=False,
+                                     help="Incrusta los datos de todos los productos comprimidos en el informe HTML, "
+                                          "con una tabla paginada con búsqueda, filtro por segmento y ordenación. El "
+                                          "informe es más pesado y tarda más en generarse")
+
     # Área principal de upload
     st.header("📤 Sube tus archivos")
 
@@ -162,14 +524,12 @@ def main():
             # Vista previa del CSV
             with st.expander("📊 Vista previa del CSV"):
                 try:
-                    # Leer primeras líneas para detectar formato
-                    content = csv_file.read()
-                    csv_file.seek(0)
-
-                    lines = content.decode('utf-8').split('\n')
+                    # Leer solo el inicio del fichero para detectar formato
+                    lines = read_head_lines(csv_file)
                     st.write(f"**Línea 1 (Título):** {lines[0][:100]}...")
                     st.write(f"**Línea 2 (Fechas):** {lines[1][:100]}...")
-                    st.write(f"**Total de líneas:** {len(lines)}")
+                    line_count = format_count(*estimate_occurrences(csv_file, b'\n'))
+                    st.write(f"**Total de líneas:** {line_count}")
 
                     # Mostrar muestra de datos
                     csv_data = '\n'.join(lines[2:10])  # Primeros 8 registros
@@ -200,19 +560,16 @@ def main():
             # Vista previa del XML
             with st.expander("📊 Vista previa del XML"):
                 try:
-                    content = xml_file.read()
-                    xml_file.seek(0)
-
-                    # Analizar estructura básica
-                    xml_str = content.decode('utf-8')
-                    lines = xml_str.split('\n')
+                    # Analizar estructura básica a partir del inicio del fichero
+                    lines = read_head_lines(xml_file)
 
-                    st.write(f"**Total de líneas:** {len(lines)}")
+                    line_count = format_count(*estimate_occurrences(xml_file, b'\n'))
+                    st.write(f"**Total de líneas:** {line_count}")
                     st.write(f"**Primera línea:** {lines[0]}")
 
-                    # Buscar items
-                    item_count = xml_str.count('<item>')
-                    st.write(f"**Items encontrados:** {item_count:,}")
+                    # Estimar items con un muestreo de bytes
+                    item_count = format_count(*estimate_occurrences(xml_file, b'<item>'))
+                    st.write(f"**Items encontrados:** {item_count}")
 
                     # Mostrar muestra de estructura
                     if len(lines) > 10:
@@ -230,161 +587,33 @@ def main():
         col1, col2, col3 = st.columns([1, 2, 1])
 
         with col2:
-            if st.button("📊 GENERAR INFORME", type="primary", use_container_width=True):
+            generate = st.button("📊 GENERAR INFORME", type="primary", use_container_width=True)
+
+            # Huellas de los ficheros subidos: identifican el análisis entre reruns
+            inputs = (file_fingerprint(csv_file), file_fingerprint(xml_file))
+
+            if generate:
                 with st.spinner("🔄 Procesando datos... Esto puede tardar unos segundos"):
                     try:
-                        # Leer archivos
-                        csv_content = csv_file.read().decode('utf-8')
-                        xml_content = xml_file.read().decode('utf-8')
-
-                        # Ejecutar análisis
-                        analyzer = PricingAnalyzer()
-
-                        # Paso 1: Parsear CSV
-                        analyzer.parse_competitiveness_csv(csv_content)
-
-                        # Paso 2: Parsear XML
-                        analyzer.parse_product_feed_xml(xml_content)
-
-                        # Paso 3: Enriquecer datos
-                        enriched_data = analyzer.enrich_data()
-
-                        # Paso 4: Calcular métricas
-                        metrics = analyzer.calculate_metrics()
-
-                        # Paso 5: Generar informe HTML
-                        generator = ReportGenerator()
-                        html_report = generator.generate_html_report(
-                            metrics,
-                            analyzer.date_range,
-                            enriched_data
-                        )
-
-                        # Éxito del procesamiento
-                        st.success("✅ ¡Análisis completado con éxito!")
-
-                        # Mostrar resumen ejecutivo
-                        st.header("📈 Resumen Ejecutivo")
-
-                        # KPIs principales
-                        col1, col2, col3, col4 = st.columns(4)
-
-                        with col1:
-                            st.markdown(f"""
-                            <div class="kpi-card">
-                                <div class="kpi-value">{metrics['globales']['total_productos']:,}</div>
-                                <div class="kpi-label">Productos Analizados</div>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                        with col2:
-                            st.markdown(f"""
-                            <div class="kpi-card">
-                                <div class="kpi-value">{metrics['globales']['total_clicks']:,}</div>
-                                <div class="kpi-label">Clics Totales</div>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                        with col3:
-                            price_diff = metrics['globales']['price_diff_stats']['media_ponderada']
-                            price_class = "price-positive" if price_diff < -1 else "price-negative" if price_diff > 1 else "price-neutral"
-                            st.markdown(f"""
-                            <div class="kpi-card">
-                                <div class="kpi-value {price_class}">{price_diff:+.2f}%</div>
-                                <div class="kpi-label">Diff. Precio Media</div>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                        with col4:
-                            quality_pct = metrics['calidad_datos']['porcentaje_match']
-                            st.markdown(f"""
-                            <div class="kpi-card">
-                                <div class="kpi-value">{quality_pct:.1f}%</div>
-                                <div class="kpi-label">Calidad de Datos</div>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                        # Métricas clave
-                        st.header("🎯 Métricas Clave")
-
-                        col1, col2 = st.columns(2)
-
-                        with col1:
-                            segments = metrics['globales']['segmento_distribucion']
-                            baratos_pct = segments.get('MUCHO_MAS_BARATO', 0) + segments.get('BARATO', 0)
-                            caros_pct = segments.get('CARO', 0) + segments.get('MUCHO_MAS_CARO', 0)
-
-                            st.metric("📉 Posición Global",
-                                    f"{baratos_pct:.1f}% más baratos vs {caros_pct:.1f}% más caros")
-                            st.metric("⚠️ Productos de Riesgo",
-                                    f"{len(metrics['productos_riesgo'])}")
-                            st.metric("💰 Oportunidades",
-                                    f"{len(metrics['oportunidades'])}")
-
-                        with col2:
-                            if metrics['marcas'] is not None and len(metrics['marcas']) > 0:
-                                top_brand = metrics['marcas'].iloc[0]
-                                st.metric("🏆 Marca Principal",
-                                        f"{top_brand['marca']} ({top_brand['clics_totales']:,} clics)")
-
-                            if metrics['temporadas'] is not None and len(metrics['temporadas']) > 0:
-                                top_temporada = metrics['temporadas'].iloc[0]
-                                st.metric("🌤️ Temporada Principal",
-                                        f"{top_temporada['temporada']} ({top_temporada['clics_totales']:,} clics)")
-
-                        # Descarga del informe
-                        st.header("📥 Descargar Informe Completo")
-
-                        # Crear enlace de descarga
-                        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                        filename = f"informe_competitividad_{timestamp}.html"
-
-                        st.markdown(f"""
-                        <div class="success-box">
-                            <h4>📋 Informe HTML generado: {filename}</h4>
-                            <p>✅ Incluye análisis completo por marcas, medidas, temporadas y vehículos</p>
-                            <p>✅ Tablas interactivas y gráficos dinámicos</p>
-                            <p>✅ Recomendaciones accionables y conclusiones clave</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-                        # Botón de descarga informe HTML
-                        b64 = base64.b64encode(html_report.encode()).decode()
-                        href = f'<a href="data:file/html;base64,{b64}" download="{filename}">📥 DESCARGAR INFORME HTML</a>'
-                        st.markdown(href, unsafe_allow_html=True)
-
-                        # ---------------------------------------------------------
-                        # NUEVO: Generación de CSV para registro
-                        # ---------------------------------------------------------
-                        st.markdown("### 💾 Exportar Datos (CSV)")
-                        
-                        # Añadir fecha de reporte para histórico
-                        enriched_data['report_date'] = datetime.now().strftime("%Y-%m-%d")
-                        
-                        # Generar CSV
-                        csv_data = enriched_data.to_csv(index=False).encode('utf-8')
-                        csv_filename = f"registro_precios_{timestamp}.csv"
-                        
-                        st.download_button(
-                            label="📥 DESCARGAR CSV DE REGISTRO",
-                            data=csv_data,
-                            file_name=csv_filename,
-                            mime='text/csv',
-                            help="Descarga el dataset completo con fecha para histórico"
-                        )
-                        # ---------------------------------------------------------
-
-                        # Vista previa del informe
-                        with st.expander("👁️ Vista previa del informe HTML", expanded=True):
-                            st.components.v1.html(html_report, height=1000, scrolling=True)
+                        st.session_state['analysis_results'] = run_analysis(inputs, csv_file, xml_file,
+                                                                            trace_memory, embed_products)
+                        st.session_state['analysis_inputs'] = inputs
+                        st.session_state['analysis_timestamp'] = datetime.now()
 
                     except Exception as e:
+                        st.session_state.pop('analysis_inputs', None)
+                        st.session_state.pop('analysis_results', None)
                         st.error(f"❌ Error en el procesamiento: {str(e)}")
                         st.error("Por favor, verifica que los archivos tengan el formato correcto.")
                         import traceback
                         st.error("Detalles técnicos:")
                         st.code(traceback.format_exc())
 
+            # Mostrar el último análisis de estos ficheros sin recalcularlo: las opciones
+            # de la barra lateral solo se aplican al pulsar el botón
+            if st.session_state.get('analysis_inputs') == inputs:
+                render_results(inputs, *st.session_state['analysis_results'], st.session_state['analysis_timestamp'])
+
     else:
         st.markdown("""
         <div class="warning-box">
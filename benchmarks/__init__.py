@@ -0,0 +1,3 @@
+"""
+Benchmarks del pipeline de análisis de precios sobre datos sintéticos
+"""
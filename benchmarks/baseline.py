@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Control de regresiones de rendimiento con líneas base guardadas
+
+'save' ejecuta los escenarios de benchmarks.run (o toma un JSON de resultados
+con --from) y los guarda como línea base de esta máquina, en un JSON por
+perfil de máquina (sistema, arquitectura, CPUs y versión de Python).
+'compare' vuelve a ejecutar los escenarios de la línea base, muestra la
+variación de cada etapa y termina con código 1 si la mediana de tiempo o el
+pico de memoria de alguna etapa empeora más del porcentaje permitido.
+
+Uso: python -m benchmarks.baseline save [--sizes 10k 100k] [--repeat 5] ...
+     python -m benchmarks.baseline compare [--threshold 20] [--memory-threshold 20]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+from benchmarks.run import add_run_arguments, machine_profile, run_benchmarks, run_scenario
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# Umbrales por defecto: porcentaje de empeoramiento permitido y variación
+# absoluta mínima para no marcar como regresión el ruido de etapas muy cortas
+DEFAULT_TIME_THRESHOLD_PCT = 20.0
+DEFAULT_MEMORY_THRESHOLD_PCT = 20.0
+DEFAULT_MIN_DELTA_S = 0.01
+DEFAULT_MIN_DELTA_MB = 1.0
+
+def machine_key(machine: Dict) -> str:
+    """Nombre del perfil de máquina, p. ej. 'linux-x86_64-8cpu-py3.11'"""
+    python = '.'.join(machine['python'].split('.')[:2])
+    key = f"{machine['sistema']}-{machine['maquina']}-{machine['cpus']}cpu-py{python}"
+    return re.sub(r'[^a-z0-9_.-]+', '_', key.lower())
+
+def baseline_path(machine: Optional[Dict] = None) -> str:
+    return os.path.join(BASELINE_DIR, f"{machine_key(machine or machine_profile())}.json")
+
+def save_baseline(results: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+def load_results(path: str) -> Dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def rerun_scenarios(baseline: Dict) -> Dict:
+    """Ejecuta de nuevo los escenarios de la línea base con su misma configuración"""
+    scenarios = []
+    for scenario in baseline['escenarios']:
+        print(f"Escenario {scenario['escenario']}...", file=sys.stderr)
+        measure_memory = any(stage['pico_memoria_mb'] is not None for stage in scenario['etapas'].values())
+        scenarios.append(run_scenario(scenario['tamano'], scenario['match_rate'], scenario['repeticiones'],
+                                      scenario['procesos_feed'], measure_memory))
+    return {'maquina': machine_profile(), 'escenarios': scenarios}
+
+def compare_results(baseline: Dict, current: Dict, time_threshold: float = DEFAULT_TIME_THRESHOLD_PCT,
+                    memory_threshold: float = DEFAULT_MEMORY_THRESHOLD_PCT, min_delta_s: float = DEFAULT_MIN_DELTA_S,
+                    min_delta_mb: float = DEFAULT_MIN_DELTA_MB) -> List[Dict]:
+    """
+    Variación por escenario y etapa. Una etapa es regresión si su mediana de
+    tiempo o su pico de memoria empeora más del umbral (en %) y además más de
+    la variación mínima absoluta
+    """
+    current_by_name = {scenario['escenario']: scenario for scenario in current['escenarios']}
+    rows = []
+
+    for scenario in baseline['escenarios']:
+        current_scenario = current_by_name.get(scenario['escenario'])
+        if current_scenario is None:
+            continue
+
+        for stage, base in scenario['etapas'].items():
+            new = current_scenario['etapas'].get(stage)
+            if new is None:
+                continue
+
+            time_pct = _delta_pct(base['mediana_s'], new['mediana_s'])
+            time_regression = time_pct is not None and time_pct > time_threshold and \
+                new['mediana_s'] - base['mediana_s'] > min_delta_s
+
+            base_mb, new_mb = base.get('pico_memoria_mb'), new.get('pico_memoria_mb')
+            memory_pct = _delta_pct(base_mb, new_mb)
+            memory_regression = memory_pct is not None and memory_pct > memory_threshold and \
+                new_mb - base_mb > min_delta_mb
+
+            rows.append({
+                'escenario': scenario['escenario'],
+                'etapa': stage,
+                'base_s': base['mediana_s'],
+                'actual_s': new['mediana_s'],
+                'tiempo_pct': time_pct,
+                'base_mb': base_mb,
+                'actual_mb': new_mb,
+                'memoria_pct': memory_pct,
+                'regresion': time_regression or memory_regression
+            })
+
+    return rows
+
+def print_comparison(rows: List[Dict]) -> None:
+    print(f"{'escenario':<18}{'etapa':<18}{'base':>9}{'actual':>9}{'Δ tiempo':>10}"
+          f"{'base MB':>9}{'act. MB':>9}{'Δ mem.':>9}  estado")
+    for row in rows:
+        print(f"{row['escenario']:<18}{row['etapa']:<18}{row['base_s']:>8.3f}s{row['actual_s']:>8.3f}s"
+              f"{_format_pct(row['tiempo_pct']):>10}{_format_mb(row['base_mb']):>9}{_format_mb(row['actual_mb']):>9}"
+              f"{_format_pct(row['memoria_pct']):>9}  {'REGRESIÓN' if row['regresion'] else 'ok'}")
+
+def _delta_pct(base: Optional[float], new: Optional[float]) -> Optional[float]:
+    if base is None or new is None or base <= 0:
+        return None
+    return (new - base) / base * 100
+
+def _format_pct(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:+.1f}%"
+
+def _format_mb(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.1f}"
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Líneas base de rendimiento y control de regresiones")
+    parser.add_argument('--baseline', help="Fichero de línea base (por defecto el del perfil de esta máquina)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    save = commands.add_parser('save', help="Guarda una línea base para esta máquina")
+    add_run_arguments(save)
+    save.add_argument('--from', dest='from_results', help="JSON de benchmarks.run a guardar sin volver a ejecutar")
+
+    compare = commands.add_parser('compare', help="Compara una nueva ejecución con la línea base")
+    compare.add_argument('--threshold', type=float, default=DEFAULT_TIME_THRESHOLD_PCT,
+                         help="Empeoramiento máximo permitido de la mediana de tiempo (%%)")
+    compare.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD_PCT,
+                         help="Empeoramiento máximo permitido del pico de memoria (%%)")
+    compare.add_argument('--min-delta-s', type=float, default=DEFAULT_MIN_DELTA_S,
+                         help="Variación mínima de tiempo (s) para considerar regresión")
+    compare.add_argument('--min-delta-mb', type=float, default=DEFAULT_MIN_DELTA_MB,
+                         help="Variación mínima de memoria (MB) para considerar regresión")
+    compare.add_argument('--results', help="JSON de benchmarks.run a comparar sin volver a ejecutar")
+    return parser
+
+def main() -> int:
+    args = build_parser().parse_args()
+    logging.getLogger('pricing_analyzer.profiling').setLevel(logging.WARNING)
+
+    if args.command == 'save':
+        if args.from_results:
+            results = load_results(args.from_results)
+        else:
+            results = run_benchmarks(args.sizes, args.match_rates, args.repeat, args.workers, not args.no_memory)
+        path = args.baseline or baseline_path(results['maquina'])
+        save_baseline(results, path)
+        print(f"Línea base guardada en {path}")
+        return 0
+
+    path = args.baseline or baseline_path()
+    if not os.path.exists(path):
+        print(f"No hay línea base para esta máquina ({path}); créala con 'save'")
+        return 2
+
+    baseline = load_results(path)
+    current = load_results(args.results) if args.results else rerun_scenarios(baseline)
+    if machine_key(baseline['maquina']) != machine_key(current['maquina']):
+        print(f"Aviso: la línea base es de otra máquina ({machine_key(baseline['maquina'])})")
+
+    rows = compare_results(baseline, current, args.threshold, args.memory_threshold,
+                           args.min_delta_s, args.min_delta_mb)
+    print_comparison(rows)
+
+    regressions = [row for row in rows if row['regresion']]
+    if regressions:
+        print(f"{len(regressions)} etapa(s) con regresión de rendimiento")
+        return 1
+    print("Sin regresiones de rendimiento")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
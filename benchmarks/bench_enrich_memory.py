@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria de enrich_data + calculate_metrics
+
+Compara el pico de memoria del enriquecimiento anterior (copia completa de
+ambos datasets, merge de todas las columnas del feed y copia del resultado en
+calculate_metrics) con el actual (claves de merge independientes, proyección
+de columnas del feed y calculate_metrics de solo lectura).
+
+Uso: python -m benchmarks.bench_enrich_memory [n_items]
+"""
+
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+from pricing_analyzer import PricingAnalyzer, DOWNSTREAM_FEED_COLUMNS
+from benchmarks.synthetic import generate_feed_xml, generate_competitiveness_csv
+
+def enrich_with_copies(analyzer: PricingAnalyzer):
+    """Enriquecimiento de referencia: copia los datasets y fusiona el feed completo"""
+    comp_id_col = analyzer._detect_id_column(analyzer.competitiveness_data)
+    feed_id_col = analyzer._detect_id_column(analyzer.feed_data)
+
+    comp_data = analyzer.competitiveness_data.copy()
+    feed_data = analyzer.feed_data.copy()
+    comp_data['_merge_key'] = comp_data[comp_id_col].astype(str).str.strip().str.upper()
+    feed_data['_merge_key'] = feed_data[feed_id_col].astype(str).str.strip().str.upper()
+
+    merged = comp_data.merge(feed_data.drop(columns=[feed_id_col]), on='_merge_key',
+                             how='left', suffixes=('_merchant', '_feed'))
+    merged.drop(columns=['_merge_key'], inplace=True)
+
+    # calculate_metrics trabajaba sobre una copia del resultado
+    analyzer.enriched_data = merged.copy()
+    return merged, analyzer.calculate_metrics()
+
+def enrich_without_copies(analyzer: PricingAnalyzer):
+    """Enriquecimiento actual más las métricas sobre el dataset sin copiar"""
+    merged = analyzer.enrich_data(DOWNSTREAM_FEED_COLUMNS)
+    return merged, analyzer.calculate_metrics()
+
+def measure(run, analyzer: PricingAnalyzer):
+    """Devuelve (segundos, pico de memoria en bytes) de run(analyzer)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run(analyzer)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+def main():
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    analyzer = PricingAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.parse_competitiveness_csv(generate_competitiveness_csv(n_items))
+        analyzer.parse_product_feed_xml(generate_feed_xml(n_items))
+
+    before_time, before_peak = measure(enrich_with_copies, analyzer)
+    after_time, after_peak = measure(enrich_without_copies, analyzer)
+
+    print(f"Items: {n_items:,} | columnas del feed: {len(analyzer.feed_data.columns)}")
+    print(f"{'':26}{'tiempo':>10}{'pico de memoria':>18}")
+    print(f"{'Copias + feed completo':26}{before_time:9.2f}s{before_peak / 1024 ** 2:15.1f} MB")
+    print(f"{'Sin copias + proyección':26}{after_time:9.2f}s{after_peak / 1024 ** 2:15.1f} MB")
+    print(f"{'Reducción':26}{'':10}{(1 - after_peak / before_peak) * 100:16.1f} %")
+
+if __name__ == "__main__":
+    main()
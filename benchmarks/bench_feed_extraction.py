@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la extracción de campos por item del feed
+
+Compara la extracción de una sola pasada (PricingAnalyzer._extract_feed_fields)
+con la búsqueda anterior de un './/g:campo' por cada campo y product_detail.
+
+La petición pedía una mejora de al menos 10x por item; la pasada única se
+queda en unas 5-6x (3-4x con iterparse). Cualquier extracción con lxml tiene
+que leer tag y text de cada elemento del item, y solo eso cuesta del orden de
+una décima parte de la búsqueda por campo, así que una extracción que además
+guarde los campos no llega a 10x. Por eso se muestran también esa lectura
+mínima y la mejora máxima que permite; el parseo incremental (iterparse)
+añade un coste fijo por item que ninguna extracción reduce. Los tiempos se
+toman con el recolector de basura desactivado, como timeit.
+
+Uso: python -m benchmarks.bench_feed_extraction [n_items]
+"""
+
+import gc
+import io
+import sys
+import time
+
+from lxml import etree
+
+from pricing_analyzer import PricingAnalyzer, GOOGLE_NS, SAFE_XML_OPTIONS
+from benchmarks.synthetic import generate_feed_xml
+
+NS = {'g': GOOGLE_NS}
+FIELDS = ['id', 'title', 'description', 'link', 'image_link', 'availability', 'price',
+          'sale_price', 'brand', 'gtin', 'mpn', 'custom_label_2', 'custom_label_3',
+          'custom_label_4', 'custom_label_5', 'dimensions', 'pattern']
+
+def _text(element, tag: str) -> str:
+    found = element.find(f'.//{tag}', NS)
+    return found.text if found is not None else ''
+
+def extract_with_descendant_search(item) -> dict:
+    """Extracción de referencia: una búsqueda descendente por campo"""
+    product = {field: _text(item, f'g:{field}') for field in FIELDS}
+    for detail in item.findall('.//g:product_detail', NS):
+        section_name = _text(detail, 'g:section_name')
+        attribute_name = _text(detail, 'g:attribute_name')
+        attribute_value = _text(detail, 'g:attribute_value')
+        if attribute_name and attribute_value:
+            product[f'section_{section_name.lower()}_{attribute_name.lower()}'] = attribute_value
+    return product
+
+def read_every_element(item) -> None:
+    """Lectura mínima: tag y text de todos los elementos del item, sin guardarlos"""
+    for element in item.iter():
+        element.tag
+        element.text
+
+def time_per_item(extract, items) -> float:
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for item in items:
+            extract(item)
+        return (time.perf_counter() - start) / len(items)
+    finally:
+        gc.enable()
+
+def time_per_item_streaming(extract, data: bytes, n_items: int) -> float:
+    """Coste por item del parseo incremental (iterparse) más la extracción"""
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _, item in etree.iterparse(io.BytesIO(data), events=('end',), tag='item', **SAFE_XML_OPTIONS):
+            extract(item)
+            item.clear()
+            while item.getprevious() is not None:
+                del item.getparent()[0]
+        return (time.perf_counter() - start) / n_items
+    finally:
+        gc.enable()
+
+def main():
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    data = generate_feed_xml(n_items)
+    items = etree.fromstring(data, etree.XMLParser(**SAFE_XML_OPTIONS)).findall('.//item')
+
+    analyzer = PricingAnalyzer()
+    before = time_per_item(extract_with_descendant_search, items)
+    after = time_per_item(analyzer._extract_feed_fields, items)
+    before_stream = time_per_item_streaming(extract_with_descendant_search, data, n_items)
+    after_stream = time_per_item_streaming(analyzer._extract_feed_fields, data, n_items)
+    floor = time_per_item(read_every_element, items)
+    floor_stream = time_per_item_streaming(read_every_element, data, n_items)
+
+    print(f"Items: {len(items):,}")
+    print(f"{'':22}{'extracción':>14}{'iterparse + extracción':>26}")
+    print(f"{'Búsqueda por campo':22}{before * 1e6:10.2f} µs{before_stream * 1e6:22.2f} µs")
+    print(f"{'Pasada única':22}{after * 1e6:10.2f} µs{after_stream * 1e6:22.2f} µs")
+    print(f"{'Lectura mínima':22}{floor * 1e6:10.2f} µs{floor_stream * 1e6:22.2f} µs")
+    print(f"{'Mejora':22}{before / after:11.1f}x{before_stream / after_stream:23.1f}x")
+    print(f"{'Mejora máxima (lxml)':22}{before / floor:11.1f}x{before_stream / floor_stream:23.1f}x")
+
+if __name__ == "__main__":
+    main()
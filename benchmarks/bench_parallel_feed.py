@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parseo paralelo del feed por rangos de items
+
+Parsea el mismo feed sintético con 1, 2, 4 y 8 procesos (hasta max_workers,
+por defecto los CPUs disponibles), comprueba que el resultado coincide con el
+parseo secuencial y muestra la aceleración, la eficiencia por proceso y el
+pico de memoria del proceso principal (medido con tracemalloc en una segunda
+pasada). Con más procesos que CPUs la aceleración no mide el escalado.
+
+Uso: python -m benchmarks.bench_parallel_feed [n_items] [max_workers]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from pricing_analyzer import PricingAnalyzer
+from benchmarks.synthetic import generate_feed_xml
+
+def parse(data: bytes, workers: int):
+    analyzer = PricingAnalyzer()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = analyzer.parse_product_feed_xml(data, workers=workers)
+    return time.perf_counter() - start, df
+
+def parent_peak_mb(data: bytes, workers: int) -> float:
+    """Pico de memoria trazada del proceso principal durante el parseo (sin el feed de entrada)"""
+    tracemalloc.start()
+    try:
+        parse(data, workers)
+        return tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    finally:
+        tracemalloc.stop()
+
+def main():
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+    cpus = os.cpu_count() or 1
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else min(8, cpus)
+    data = generate_feed_xml(n_items)
+
+    print(f"Items: {n_items:,} | {len(data) / 1024 ** 2:.0f} MB | CPUs disponibles: {cpus}")
+    if max_workers > cpus:
+        print(f"Aviso: con más de {cpus} procesos la aceleración no mide el escalado")
+    print(f"{'procesos':>10}{'tiempo':>10}{'aceleración':>14}{'eficiencia':>12}{'pico principal':>16}")
+
+    sequential_time, sequential = parse(data, workers=1)
+    print(f"{1:>10}{sequential_time:9.2f}s{1:13.2f}x{1:11.0%}{parent_peak_mb(data, 1):13.0f} MB")
+
+    workers = 2
+    while workers <= max_workers:
+        elapsed, df = parse(data, workers=workers)
+        pd.testing.assert_frame_equal(df, sequential)
+        speedup = sequential_time / elapsed
+        print(f"{workers:>10}{elapsed:9.2f}s{speedup:13.2f}x{speedup / workers:11.0%}"
+              f"{parent_peak_mb(data, workers):13.0f} MB")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
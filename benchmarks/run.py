@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo del pipeline de análisis
+
+Genera un escenario sintético por cada tamaño y proporción de match (CSV de
+Merchant Center y feed RSS con g:product_detail), ejecuta en secuencia las
+etapas de PricingAnalyzer y ReportGenerator (csv, feed, enriquecimiento,
+metricas, informe) y mide cada una con profiling.RunProfile. Los tiempos son
+la mediana de --repeat ejecuciones; el pico de memoria se mide en una
+ejecución aparte con tracemalloc, que ralentiza el código. Los resultados se
+escriben en JSON.
+
+Uso: python -m benchmarks.run [--sizes 10k 100k] [--match-rates 1.0 0.8]
+                              [--repeat 3] [--workers 1] [--no-memory]
+                              [--output resultados.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from pricing_analyzer import PricingAnalyzer
+from report_generator import ReportGenerator
+from profiling import RunProfile
+from benchmarks.synthetic import generate_dataset, parse_size
+
+DEFAULT_SIZES = ['10k', '100k']
+DEFAULT_MATCH_RATES = [1.0]
+DEFAULT_REPEAT = 3
+
+def scenario_name(size: str, match_rate: float) -> str:
+    return f"{size}-match{round(match_rate * 100)}"
+
+def machine_profile() -> Dict:
+    """Datos de la máquina y de las versiones que condicionan los tiempos"""
+    return {
+        'sistema': platform.system(),
+        'maquina': platform.machine(),
+        'procesador': platform.processor(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__
+    }
+
+def run_stages(csv_content: str, xml_content: bytes, workers: int, trace_memory: bool) -> RunProfile:
+    """Ejecuta las etapas del análisis en secuencia y devuelve sus medidas"""
+    profile = RunProfile(trace_memory=trace_memory)
+    analyzer = PricingAnalyzer(profile=profile)
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.parse_competitiveness_csv(csv_content)
+        analyzer.parse_product_feed_xml(xml_content, workers=workers)
+        analyzer.enrich_data()
+        metrics = analyzer.calculate_metrics()
+        ReportGenerator(profile=profile).generate_html_report(metrics, analyzer.date_range, analyzer.enriched_data)
+    return profile
+
+def run_scenario(size: str, match_rate: float, repeat: int, workers: int, measure_memory: bool) -> Dict:
+    """Mide todas las etapas de un escenario"""
+    n_items = parse_size(size)
+    start = time.perf_counter()
+    csv_content, xml_content = generate_dataset(n_items, match_rate)
+    generation_s = time.perf_counter() - start
+
+    runs = [run_stages(csv_content, xml_content, workers, trace_memory=False) for _ in range(repeat)]
+    traced = run_stages(csv_content, xml_content, workers, trace_memory=True) if measure_memory else None
+
+    stages = {}
+    for i, stage in enumerate(runs[0].stages):
+        wall = [run.stages[i].wall_s for run in runs]
+        cpu = [run.stages[i].cpu_s for run in runs]
+        stages[stage.stage] = {
+            'tiempos_s': wall,
+            'mediana_s': statistics.median(wall),
+            'cpu_mediana_s': statistics.median(cpu),
+            'filas_entrada': stage.rows_in,
+            'filas_salida': stage.rows_out,
+            'pico_memoria_mb': traced.stages[i].peak_mb if traced else None
+        }
+
+    return {
+        'escenario': scenario_name(size, match_rate),
+        'tamano': size,
+        'items': n_items,
+        'match_rate': match_rate,
+        'repeticiones': repeat,
+        'procesos_feed': workers,
+        'csv_mb': len(csv_content.encode('utf-8')) / 1024 ** 2,
+        'feed_mb': len(xml_content) / 1024 ** 2,
+        'generacion_s': generation_s,
+        'etapas': stages
+    }
+
+def run_benchmarks(sizes: List[str], match_rates: List[float], repeat: int = DEFAULT_REPEAT,
+                   workers: int = 1, measure_memory: bool = True) -> Dict:
+    """Ejecuta todos los escenarios y devuelve los resultados serializables a JSON"""
+    scenarios = []
+    for size in sizes:
+        for match_rate in match_rates:
+            print(f"Escenario {scenario_name(size, match_rate)}...", file=sys.stderr)
+            scenarios.append(run_scenario(size, match_rate, repeat, workers, measure_memory))
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'maquina': machine_profile(),
+        'escenarios': scenarios
+    }
+
+def print_results(results: Dict) -> None:
+    print(f"{'escenario':<18}{'etapa':<18}{'mediana':>10}{'cpu':>10}{'filas':>12}{'pico MB':>10}")
+    for scenario in results['escenarios']:
+        for stage, data in scenario['etapas'].items():
+            rows = data['filas_salida'] if data['filas_salida'] is not None else data['filas_entrada']
+            peak = f"{data['pico_memoria_mb']:.1f}" if data['pico_memoria_mb'] is not None else '-'
+            print(f"{scenario['escenario']:<18}{stage:<18}{data['mediana_s']:>9.3f}s{data['cpu_mediana_s']:>9.3f}s"
+                  f"{rows if rows is not None else '-':>12}{peak:>10}")
+
+def add_run_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opciones de escenarios y ejecución (compartidas con benchmarks.baseline)"""
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help="Tamaños de escenario: 10k, 100k, 250k, 1m o un número de items")
+    parser.add_argument('--match-rates', nargs='+', type=float, default=DEFAULT_MATCH_RATES,
+                        help="Proporción de filas del CSV con match en el feed")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Ejecuciones por escenario")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para parsear el feed")
+    parser.add_argument('--no-memory', action='store_true', help="No medir el pico de memoria")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del pipeline de análisis")
+    add_run_arguments(parser)
+    parser.add_argument('--output', help="Fichero JSON de resultados")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    logging.getLogger('pricing_analyzer.profiling').setLevel(logging.WARNING)
+
+    results = run_benchmarks(args.sizes, args.match_rates, args.repeat, args.workers, not args.no_memory)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.output}")
+
+if __name__ == '__main__':
+    main()
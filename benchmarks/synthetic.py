@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Generadores de datos sintéticos con el formato de Google Shopping / Merchant Center
+"""
+
+import random
+
+BRANDS = ['MICHELIN', 'CONTINENTAL', 'PIRELLI', 'BRIDGESTONE', 'HANKOOK', 'GOODYEAR', 'NEXEN', 'KUMHO']
+TITLE_WORDS = ['Turismo', 'SUV', '4x4', 'Furgoneta', 'Van', 'Invierno', 'Verano', 'All Season',
+               'Touring', 'Sport', 'Eco', 'Premium', 'Cargo', 'Winter', 'Summer']
+SEASONS = ['Verano', 'Invierno', 'Todo Tiempo']
+VEHICLES = ['Turismo', '4x4', 'Furgoneta']
+
+# Tamaños de escenario habituales (items del feed y filas del CSV)
+SIZES = {'10k': 10_000, '100k': 100_000, '250k': 250_000, '1m': 1_000_000}
+
+# Proporción de items con cada campo opcional en el feed
+SALE_PRICE_RATE = 0.3
+DETAIL_RATE = 0.9
+
+def parse_size(size: str) -> int:
+    """Convierte '10k', '1m' o '25000' en un número de items"""
+    size = size.strip().lower()
+    if size in SIZES:
+        return SIZES[size]
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(size[-1:], 1)
+    return int(float(size.rstrip('km')) * multiplier)
+
+def generate_feed_xml(n_items: int, seed: int = 42) -> bytes:
+    """Genera un feed RSS de Google Shopping con n_items productos"""
+    rnd = random.Random(seed)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+        '<title>Feed sintético</title>\n'
+    ]
+
+    for i in range(n_items):
+        brand = rnd.choice(BRANDS)
+        medida = f'{rnd.choice([175, 185, 195, 205, 215, 225, 235])}/{rnd.choice([45, 50, 55, 60, 65])} R{rnd.choice([15, 16, 17, 18])}'
+        title = f'Neumático {brand.title()} {" ".join(rnd.sample(TITLE_WORDS, 2))} {medida}'
+        price = rnd.uniform(40, 300)
+        sale_price = f'<g:sale_price>{price * 0.9:.2f} EUR</g:sale_price>' if rnd.random() < SALE_PRICE_RATE else ''
+        details = [
+            ('Medida', medida),
+            ('Modelo', f'Modelo {rnd.randint(1, 300)}'),
+            ('Temporada', rnd.choice(SEASONS)),
+            ('Vehículo', rnd.choice(VEHICLES)),
+        ]
+        product_details = ''.join(
+            '<g:product_detail><g:section_name>General</g:section_name>'
+            f'<g:attribute_name>{name}</g:attribute_name><g:attribute_value>{value}</g:attribute_value></g:product_detail>'
+            for name, value in details if rnd.random() < DETAIL_RATE
+        )
+        parts.append(
+            '<item>'
+            f'<g:id>SKU-{i:07d}</g:id>'
+            f'<g:title>{title}</g:title>'
+            f'<g:description>{title}. Neumático de alto rendimiento con excelente agarre.</g:description>'
+            f'<g:link>https://www.example.com/p/{i}</g:link>'
+            f'<g:image_link>https://www.example.com/img/{i}.jpg</g:image_link>'
+            '<g:availability>in stock</g:availability>'
+            f'<g:price>{price:.2f} EUR</g:price>'
+            f'{sale_price}'
+            f'<g:brand>{brand}</g:brand>'
+            f'<g:gtin>{rnd.randint(10 ** 12, 10 ** 13 - 1)}</g:gtin>'
+            f'<g:mpn>MPN{i}</g:mpn>'
+            f'{product_details}'
+            f'<g:custom_label_2>{rnd.choice(VEHICLES)}</g:custom_label_2>'
+            f'<g:custom_label_3>{rnd.choice(["PREMIUM", "QUALITY", "BUDGET"])}</g:custom_label_3>'
+            f'<g:dimensions>{medida}</g:dimensions>'
+            '</item>\n'
+        )
+
+    parts.append('</channel>\n</rss>\n')
+    return ''.join(parts).encode('utf-8')
+
+def generate_competitiveness_csv(n_items: int, seed: int = 42, match_rate: float = 1.0) -> str:
+    """
+    Genera un informe de competitividad de precios de Merchant Center de
+    n_items filas. Con match_rate=1.0 sus IDs son los de
+    generate_feed_xml(n_items), en el mismo orden; con menos, esa proporción
+    de filas usa IDs del feed y el resto IDs que no están en él, mezclados.
+    Algunos IDs y marcas cambian de mayúsculas como en los informes reales
+    """
+    rnd = random.Random(seed)
+    lines = [
+        '"Competitividad de precios"',
+        '"1 ene 2025 - 31 ene 2025"',
+        'ID de producto,Título,Marca,Tu precio,Referencia,Diferencia de precios,Clics',
+    ]
+
+    if match_rate >= 1.0:
+        ids = [f'SKU-{i:07d}' for i in range(n_items)]
+    else:
+        n_matched = round(n_items * match_rate)
+        ids = [f'SKU-{i:07d}' for i in rnd.sample(range(n_items), n_matched)]
+        ids += [f'GMC-{i:07d}' for i in range(n_items - n_matched)]
+        rnd.shuffle(ids)
+
+    for i, product_id in enumerate(ids):
+        brand = rnd.choice(BRANDS)
+        price = rnd.uniform(40, 300)
+        diff = rnd.uniform(-0.15, 0.15)
+        clicks = rnd.choice([0, 1, 3, 10, 25, 60, 150, 400])
+        if rnd.random() < 0.1:
+            product_id, brand = product_id.lower(), brand.title()
+        lines.append(f'{product_id},"Neumático {brand.title()} {i}",{brand},{price:.2f},{price * (1 - diff):.2f},{diff:.4f},{clicks}')
+
+    return '\n'.join(lines) + '\n'
+
+def generate_dataset(n_items: int, match_rate: float = 1.0, seed: int = 42):
+    """CSV de competitividad y feed XML de un escenario de n_items productos"""
+    return generate_competitiveness_csv(n_items, seed, match_rate), generate_feed_xml(n_items, seed)
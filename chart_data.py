@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Datos del gráfico de diferencia de precio vs clics
+Resume todos los productos en un histograma 2D ponderado por clics (diferencia
+de precio × clics en escala logarítmica) y añade como puntos sueltos los
+productos más atípicos, de modo que el tamaño de los datos del gráfico no
+depende del número de productos
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from partial_metrics import click_counts, top_rows
+
+# Celdas del histograma en cada eje
+DIFF_BINS = 40
+CLICK_BINS = 25
+
+# Percentiles de la diferencia de precio que delimitan el eje x; los valores
+# de fuera se acumulan en las celdas de los extremos
+DIFF_RANGE_QUANTILES = (0.005, 0.995)
+
+# Productos atípicos que se dibujan como puntos (mayor |diferencia| × clics)
+OUTLIER_PRODUCTS = 100
+
+# Radio (px) de las burbujas con menos y más clics
+BUBBLE_MIN_RADIUS = 2
+BUBBLE_MAX_RADIUS = 20
+
+def price_click_density(df: pd.DataFrame, diff_bins: int = DIFF_BINS, click_bins: int = CLICK_BINS,
+                        outliers: int = OUTLIER_PRODUCTS) -> Dict:
+    """
+    Burbujas del histograma (una por celda con productos: centro, rango,
+    productos, clics y radio proporcional a la raíz de sus clics) y puntos
+    de los productos atípicos. Los productos sin diferencia se omiten
+    """
+    diff = pd.to_numeric(df['price_diff_pct'], errors='coerce')
+    valid = diff.notna().to_numpy()
+    x = diff.to_numpy(dtype='float64', na_value=np.nan)[valid]
+    clicks = np.nan_to_num(click_counts(df).to_numpy(dtype='float64', na_value=np.nan))[valid]
+
+    result = {'bins': [], 'outliers': [], 'productos': int(valid.sum())}
+    if len(x) == 0:
+        return result
+
+    # Ejes: diferencia entre percentiles y clics en log1p (0 clics incluido)
+    low, high = np.quantile(x, DIFF_RANGE_QUANTILES)
+    if high <= low:
+        low, high = low - 1, high + 1
+    x_edges = np.linspace(low, high, diff_bins + 1)
+    y = np.log1p(clicks)
+    y_edges = np.linspace(0, max(y.max(), 1.0), click_bins + 1)
+
+    x_clipped = np.clip(x, low, high)
+    counts, _, _ = np.histogram2d(x_clipped, y, bins=[x_edges, y_edges])
+    weights, _, _ = np.histogram2d(x_clipped, y, bins=[x_edges, y_edges], weights=clicks)
+
+    ix, iy = np.nonzero(counts)
+    cell_clicks = weights[ix, iy]
+    max_clicks = cell_clicks.max()
+    scale = np.sqrt(cell_clicks / max_clicks) if max_clicks > 0 else np.zeros(len(ix))
+    radius = BUBBLE_MIN_RADIUS + (BUBBLE_MAX_RADIUS - BUBBLE_MIN_RADIUS) * scale
+
+    # Centro de cada celda en unidades de clics (media geométrica en log1p)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = np.expm1((y_edges[:-1] + y_edges[1:]) / 2)
+    click_edges = np.expm1(y_edges)
+
+    result['bins'] = [
+        {
+            'x': round(float(x_centers[i]), 2),
+            'y': round(float(y_centers[j]), 2),
+            'r': round(float(r), 1),
+            'diff_min': round(float(x_edges[i]), 2),
+            'diff_max': round(float(x_edges[i + 1]), 2),
+            'clics_min': int(np.ceil(click_edges[j])),
+            'clics_max': int(np.floor(click_edges[j + 1])),
+            'productos': int(counts[i, j]),
+            'clics': int(round(w))
+        }
+        for i, j, r, w in zip(ix.tolist(), iy.tolist(), radius.tolist(), cell_clicks.tolist())
+    ]
+    result['outliers'] = _outlier_points(df, np.flatnonzero(valid), np.abs(x) * clicks, outliers)
+    return result
+
+def _outlier_points(df: pd.DataFrame, positions: np.ndarray, impact: np.ndarray, n: int) -> List[Dict]:
+    """
+    Productos con mayor impacto (|diferencia| × clics, solo los que tienen
+    clics). positions son las filas de df a las que corresponde impact
+    """
+    # Candidatos con numpy (incluidos los empates con el n-ésimo) para no
+    # copiar filas de todo el DataFrame
+    candidates = np.flatnonzero(impact > 0)
+    if len(candidates) > n:
+        kth = np.partition(impact[candidates], len(candidates) - n)[len(candidates) - n]
+        candidates = candidates[impact[candidates] >= kth]
+    scored = df.iloc[positions[candidates]].assign(_impacto=impact[candidates])
+    top = top_rows(scored, n, ['_impacto', 'Clics'])
+
+    titles = top['Título'].astype(str) if 'Título' in top.columns else pd.Series('N/A', index=top.index)
+    titles = titles.str.slice(0, 30) + np.where(titles.str.len() > 30, '...', '')
+    brands = top['Marca'].astype(object).where(top['Marca'].notna(), 'N/A') if 'Marca' in top.columns \
+        else pd.Series('N/A', index=top.index)
+
+    return [
+        {'x': round(float(x), 2), 'y': int(y), 'title': title, 'brand': str(brand)}
+        for x, y, title, brand in zip(top['price_diff_pct'].tolist(), click_counts(top).tolist(),
+                                      titles.tolist(), brands.tolist())
+    ]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Caché en disco de feeds de productos ya parseados
+Guarda el DataFrame estandarizado en formato Feather (Arrow) identificado por
+la huella del contenido del feed, con expulsión LRU limitada por tamaño
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Configuración por defecto de la caché
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.feed_cache')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Tamaño de bloque para calcular la huella de objetos tipo fichero
+_HASH_BLOCK_SIZE = 8 * 1024 ** 2
+
+# Versión del formato de las entradas: forma parte del nombre del fichero para
+# no leer feeds guardados con tipos anteriores (p. ej. precios en float32)
+CACHE_FORMAT_VERSION = 2
+
+# Clave de los metadatos del esquema Arrow donde se guarda DataFrame.attrs
+_ATTRS_METADATA_KEY = b'feed_cache.attrs'
+
+class FeedCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprint(self, content) -> str:
+        """
+        Calcula la huella del contenido del feed (str, bytes u objeto tipo
+        fichero). Los ficheros se leen por bloques y se devuelven a su posición
+        """
+        digest = hashlib.blake2b(digest_size=20)
+
+        if hasattr(content, 'read'):
+            position = content.tell()
+            for block in iter(lambda: content.read(_HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+            content.seek(position)
+        elif isinstance(content, str):
+            digest.update(content.encode('utf-8'))
+        else:
+            digest.update(memoryview(content))
+
+        return digest.hexdigest()
+
+    def variant(self, key: str, values: Iterable[str]) -> str:
+        """
+        Clave de una variante de la entrada key (p. ej. el feed filtrado por un
+        conjunto de IDs); no depende del orden de values
+        """
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=20)
+        for value in sorted(values):
+            digest.update(value.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Devuelve el feed cacheado para la huella o None si no existe"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            table = feather.read_table(path, memory_map=True)
+            attrs = (table.schema.metadata or {}).get(_ATTRS_METADATA_KEY)
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            if attrs:
+                df.attrs.update(json.loads(attrs))
+        except Exception as e:
+            print(f"Entrada de caché corrupta, se descarta: {e}")
+            self._remove(path)
+            return None
+
+        # Marcar como usado recientemente para la política LRU
+        os.utime(path)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Guarda el feed parseado (con su índice con nombre y sus attrs) y expulsa
+        las entradas más antiguas si se supera el límite
+        """
+        # Escribir en un temporal y renombrar para no dejar ficheros a medias
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            # El índice con nombre (IDs normalizados del feed) se guarda con los datos
+            # y DataFrame.attrs en los metadatos del esquema
+            table = pa.Table.from_pandas(df if df.index.name else df.reset_index(drop=True))
+            if df.attrs:
+                metadata = dict(table.schema.metadata or {})
+                metadata[_ATTRS_METADATA_KEY] = json.dumps(df.attrs).encode('utf-8')
+                table = table.replace_schema_metadata(metadata)
+
+            # Sin compresión para poder mapear el fichero en memoria al leerlo
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        self._evict(keep=key)
+
+    def clear(self) -> None:
+        """Elimina todas las entradas de la caché"""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _evict(self, keep: str) -> None:
+        """Elimina las entradas usadas hace más tiempo hasta respetar max_bytes"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        keep_path = self._path(keep)
+
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            self._remove(path)
+            total -= size
+
+    def _entries(self):
+        """Lista (ruta, tamaño, último uso) de las entradas de la caché"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.feather'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.v{CACHE_FORMAT_VERSION}.feather')
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Renderizado de tablas HTML por columnas
+Cada columna se formatea de una vez (números, escapado HTML, clase CSS de la
+diferencia de precio) y las filas se unen en una sola pasada, sin recorrer el
+DataFrame fila a fila con iterrows
+"""
+
+import html
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Ufuncs de objetos: aplican format/html.escape a todos los valores del array
+_format = np.frompyfunc(format, 2, 1)
+_escape = np.frompyfunc(html.escape, 1, 1)
+
+# Diferencia de precio (%) a partir de la cual somos más baratos/caros
+PRICE_CLASS_MARGIN = 1.0
+
+Cells = Union[str, np.ndarray]
+
+def column(df: pd.DataFrame, name: str, default=None) -> pd.Series:
+    """Columna del DataFrame o, si no existe, una columna con default"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+def text(values: pd.Series, max_length: Optional[int] = None, ellipsis: str = '...') -> np.ndarray:
+    """
+    Texto escapado para HTML. Con max_length se trunca antes de escapar y se
+    añade ellipsis a los valores recortados
+    """
+    values = values.astype(str)
+    if max_length is not None:
+        truncated = values.str.len() > max_length
+        values = values.str.slice(0, max_length) + np.where(truncated, ellipsis, '')
+
+    # Se escapa cada valor distinto una vez (marcas, medidas... se repiten mucho)
+    codes, uniques = pd.factorize(values)
+    return _escape(uniques.to_numpy(dtype=object)).take(codes)
+
+def number(values: pd.Series, spec: str, suffix: str = '', integer: bool = False) -> np.ndarray:
+    """Valores formateados con format(valor, spec); integer=True trata los nulos como 0"""
+    if integer:
+        array = pd.to_numeric(values, errors='coerce').fillna(0).to_numpy().astype('int64')
+    else:
+        array = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    formatted = _format(array, spec)
+    return formatted + suffix if suffix else formatted
+
+def price_class(values: pd.Series) -> np.ndarray:
+    """Clase CSS price-positive/neutral/negative de cada diferencia (NaN es neutral)"""
+    diff = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    classes = np.select(
+        [diff < -PRICE_CLASS_MARGIN, diff > PRICE_CLASS_MARGIN],
+        ['price-positive', 'price-negative'],
+        'price-neutral'
+    )
+    return classes.astype(object)
+
+def td(contents: Cells, css_class: Optional[Cells] = None, title: Optional[Cells] = None) -> Cells:
+    """
+    Celdas <td> de una columna. css_class y title pueden ser un valor para
+    toda la columna o un array con uno por fila (ya escapados)
+    """
+    opening = '<td'
+    if css_class is not None:
+        opening = opening + ' class="' + css_class + '"'
+    if title is not None:
+        opening = opening + ' title="' + title + '"'
+    return opening + '>' + contents + '</td>'
+
+def rows(cells: Sequence[Cells], n_rows: int) -> str:
+    """Une las columnas de celdas en filas <tr> (una sola pasada)"""
+    if n_rows == 0:
+        return ''
+    columns = [np.broadcast_to(np.asarray(cell, dtype=object), (n_rows,)) for cell in cells]
+    template = '<tr>' + '{}' * len(columns) + '</tr>\n'
+    return ''.join(template.format(*row) for row in zip(*columns))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Cubo OLAP precalculado sobre los datos enriquecidos
+Agrupa los productos por la combinación de valores de las dimensiones de
+análisis (celdas) y guarda por celda los clics, las diferencias ponderadas por
+clics y los recuentos. Cualquier corte o agregación (p. ej. marca × medida
+filtrando una temporada) se resuelve sobre las celdas, sin volver a los datos
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from partial_metrics import click_counts
+
+# Dimensiones del cubo (las que no existan en los datos se omiten)
+CUBE_DIMENSIONS = (
+    'Marca', 'medida_final', 'temporada_limpia', 'vehiculo_final',
+    'segmento_quality', 'category_inferred', 'segmento_precio'
+)
+
+# Medidas sumables de cada celda
+CUBE_MEASURES = ('productos', 'clics', 'diff_x_clics', 'diff_suma', 'diff_recuento')
+
+class OlapCube:
+    """
+    Celdas con las dimensiones codificadas como enteros (codes) y sus etiquetas
+    en members. Los valores vacíos (NaN) son un miembro más con etiqueta None
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: Sequence[str] = CUBE_DIMENSIONS):
+        self.dimensions = [dim for dim in dimensions if dim in df.columns]
+        self.members: Dict[str, pd.Index] = {}
+
+        row_codes = {}
+        for dim in self.dimensions:
+            codes, labels = self._encode(df[dim])
+            self.members[dim] = labels
+            row_codes[dim] = codes
+
+        clicks = click_counts(df)
+        diff = df['price_diff_pct']
+        rows = pd.DataFrame({
+            **row_codes,
+            'productos': 1,
+            'clics': clicks,
+            'diff_x_clics': diff * df['Clics'],
+            'diff_suma': diff,
+            'diff_recuento': diff.notna()
+        })
+
+        if self.dimensions:
+            cells = rows.groupby(self.dimensions, sort=False).sum().reset_index()
+        else:
+            cells = rows.sum().to_frame().T
+
+        self.codes = {dim: cells[dim].to_numpy() for dim in self.dimensions}
+        self.measures = {
+            'productos': cells['productos'].to_numpy(dtype='int64'),
+            'clics': cells['clics'].to_numpy(dtype='float64' if clicks.dtype.kind == 'f' else 'int64'),
+            'diff_x_clics': cells['diff_x_clics'].to_numpy(dtype='float64'),
+            'diff_suma': cells['diff_suma'].to_numpy(dtype='float64'),
+            'diff_recuento': cells['diff_recuento'].to_numpy(dtype='int64')
+        }
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.measures['productos'])
+
+    def query(self, by: Sequence[str] = (), filters: Optional[Dict[str, Iterable]] = None) -> pd.DataFrame:
+        """
+        Agrega las celdas que cumplen los filtros ({dimensión: valores
+        admitidos}) por las dimensiones de by. Devuelve una fila por
+        combinación con clics_totales, productos y las medias simple y
+        ponderada de la diferencia de precio, ordenada por clics
+        """
+        for dim in list(by) + list(filters or {}):
+            if dim not in self.members:
+                raise ValueError(f"Dimensión no disponible en el cubo: '{dim}'")
+
+        mask = self._filter_mask(filters or {})
+        if by:
+            groups, keys = self._group_cells(list(by), mask)
+            n_groups = len(groups[by[0]])
+        else:
+            groups, keys, n_groups = {}, np.zeros(int(mask.sum()), dtype='int64'), 1
+
+        sums = {
+            name: np.bincount(keys, weights=values[mask], minlength=n_groups)
+            for name, values in self.measures.items()
+        }
+
+        result = pd.DataFrame({dim: self.members[dim].take(groups[dim]) for dim in by})
+        result['clics_totales'] = sums['clics'].astype(self.measures['clics'].dtype)
+        result['productos'] = sums['productos'].astype('int64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['price_diff_media_simple'] = sums['diff_suma'] / sums['diff_recuento']
+            result['price_diff_media_ponderada'] = sums['diff_x_clics'] / sums['clics']
+
+        if not by and not mask.any():
+            result = result.iloc[0:0]
+        return result.sort_values('clics_totales', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    def _filter_mask(self, filters: Dict[str, Iterable]) -> np.ndarray:
+        """Celdas cuyos valores están entre los admitidos en cada dimensión filtrada"""
+        mask = np.ones(self.n_cells, dtype=bool)
+        for dim, values in filters.items():
+            members = self.members[dim]
+            values = list(values)
+            allowed = members.get_indexer([value for value in values if value is not None])
+            if any(value is None for value in values):
+                allowed = np.append(allowed, np.flatnonzero(members.isna()))
+            mask &= np.isin(self.codes[dim], allowed[allowed >= 0])
+        return mask
+
+    def _group_cells(self, by: List[str], mask: np.ndarray):
+        """
+        Código de grupo de cada celda seleccionada y códigos de cada dimensión
+        por grupo. Con pocas combinaciones posibles la clave es un entero
+        compuesto; si no, se agrupa por filas
+        """
+        codes = [self.codes[dim][mask] for dim in by]
+        shape = [len(self.members[dim]) for dim in by]
+
+        if np.prod(shape, dtype='float64') < 2 ** 62:
+            composite = np.ravel_multi_index(codes, shape)
+            unique, keys = np.unique(composite, return_inverse=True)
+            group_codes = np.unravel_index(unique, shape)
+        else:
+            unique, keys = np.unique(np.column_stack(codes), axis=0, return_inverse=True)
+            group_codes = unique.T
+
+        return dict(zip(by, group_codes)), keys.reshape(-1)
+
+    def _encode(self, values: pd.Series):
+        """Códigos enteros compactos y etiquetas de una dimensión (NaN como miembro None)"""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy().astype('int64')
+            labels = values.cat.categories
+        else:
+            codes, labels = pd.factorize(values)
+
+        missing = codes < 0
+        if missing.any():
+            codes = np.where(missing, len(labels), codes)
+            labels = labels.astype(object).append(pd.Index([None], dtype=object))
+
+        dtype = np.min_scalar_type(max(len(labels) - 1, 0))
+        return codes.astype(dtype if dtype.kind == 'u' else 'int64'), pd.Index(labels)
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Agregados parciales combinables para calcular las métricas de pricing por bloques
+Cada bloque de filas enriquecidas produce un estado pequeño (sumas por
+dimensión, sumas por segmento, candidatos a los rankings y sketches de
+cuantiles) que se combina con el de los bloques siguientes, de modo que las
+métricas de calculate_metrics se pueden obtener sin tener todo el dataset en
+memoria
+
+Tolerancia frente al cálculo en memoria:
+- Recuentos, sumas de clics, segmentos, top productos, productos de riesgo y
+  oportunidades son exactos (mismas filas y mismo orden)
+- Las medias (simple, ponderada y por dimensión) se calculan como suma/recuento
+  acumulados y pueden diferir en el redondeo de coma flotante (error relativo
+  del orden de 1e-12)
+- La mediana de price_diff_pct y el umbral de clics (percentil 75) son exactos
+  mientras cada sketch tenga como mucho max_bins valores distintos; por encima
+  se compactan en max_bins grupos de peso similar y el error de rango queda
+  acotado por 1/max_bins de las filas
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tamaño de los rankings de calculate_metrics
+TOP_PRODUCTS = 50
+RISK_PRODUCTS = 20
+OPPORTUNITY_PRODUCTS = 20
+
+# Percentil de clics a partir del cual un producto entra en riesgo u oportunidades
+RISK_CLICKS_QUANTILE = 0.75
+
+# Valores distintos que guarda cada sketch de cuantiles antes de compactarse
+SKETCH_MAX_BINS = 100000
+
+# Columnas de los rankings (orden de nlargest)
+RISK_RANKING = ['price_diff_pct', 'Clics']
+OPPORTUNITY_RANKING = ['Clics', 'price_diff_pct']
+
+def click_counts(df: pd.DataFrame) -> pd.Series:
+    """Clics con enteros ampliados a int64 para que las sumas agrupadas no desborden"""
+    clicks = df['Clics']
+    return clicks.astype('int64') if pd.api.types.is_integer_dtype(clicks) else clicks
+
+def dimension_partial(df: pd.DataFrame, spec: Dict) -> Optional[Tuple[pd.DataFrame, Optional[pd.Series]]]:
+    """
+    Sumas combinables de una dimensión de DIMENSION_BREAKDOWNS: clics,
+    productos, suma y recuento de diferencias y clics×diferencia por valor, y
+    en las dimensiones detalladas los clics por (valor, segmento). None si la
+    columna no existe
+    """
+    column = spec['column']
+    if column not in df.columns:
+        return None
+
+    keys = df[column]
+    clicks = click_counts(df)
+    work = pd.DataFrame({
+        'clics': clicks,
+        'diff': df['price_diff_pct'],
+        'diff_x_clics': df['price_diff_pct'] * df['Clics']
+    })
+    grouped = work.groupby(keys, sort=False, observed=True).agg(
+        clics_totales=('clics', 'sum'),
+        productos=('clics', 'size'),
+        diff_suma=('diff', 'sum'),
+        diff_recuento=('diff', 'count'),
+        diff_x_clics=('diff_x_clics', 'sum')
+    )
+
+    segment_clicks = None
+    if spec.get('detailed', False):
+        segment_clicks = clicks.groupby([keys, df['segmento_precio']], sort=False, observed=True).sum()
+
+    return grouped, segment_clicks
+
+def merge_dimension_partials(first, second):
+    """Combina dos resultados de dimension_partial conservando el orden de primera aparición"""
+    if first is None or second is None:
+        return second if first is None else first
+
+    grouped = _sum_by_index(first[0], second[0])
+    segment_clicks = None
+    if first[1] is not None:
+        segment_clicks = _sum_by_index(first[1], second[1])
+    return grouped, segment_clicks
+
+def finalize_dimension(spec: Dict, partial) -> Optional[pd.DataFrame]:
+    """
+    Construye la tabla de una dimensión a partir de sus sumas: filtra valores
+    cortos o sin clics, calcula medias y porcentajes por segmento y ordena por
+    clics
+    """
+    label = spec['label']
+    detailed = spec.get('detailed', False)
+
+    result_columns = [label, 'clics_totales', 'productos']
+    if detailed:
+        result_columns.append('price_diff_media_simple')
+    result_columns.append('price_diff_media_ponderada')
+    if detailed:
+        result_columns.append('segmentos')
+
+    if partial is None:
+        return None
+    grouped, segment_clicks = partial
+
+    # Ignorar valores vacíos o muy cortos y dimensiones sin clics significativos
+    keep = grouped['clics_totales'] > spec.get('min_clicks', 0)
+    min_length = spec.get('min_length', 0)
+    if min_length:
+        keep &= grouped.index.astype(str).str.len() >= min_length
+    grouped = grouped[keep]
+
+    if grouped.empty:
+        return pd.DataFrame(columns=result_columns)
+
+    result = pd.DataFrame({
+        label: grouped.index.to_numpy(),
+        'clics_totales': grouped['clics_totales'].to_numpy(),
+        'productos': grouped['productos'].to_numpy()
+    })
+    if detailed:
+        result['price_diff_media_simple'] = (grouped['diff_suma'] / grouped['diff_recuento']).to_numpy()
+    result['price_diff_media_ponderada'] = (grouped['diff_x_clics'] / grouped['clics_totales']).to_numpy()
+
+    if detailed:
+        # Porcentaje de clics de cada valor en cada segmento de precio presente
+        segment_pct = (segment_clicks.div(grouped['clics_totales'], level=0) * 100).round(1).unstack()
+        segment_pct = segment_pct.reindex(grouped.index)
+        result['segmentos'] = [
+            {segment: pct for segment, pct in row.items() if pct == pct}
+            for row in segment_pct.to_dict('records')
+        ]
+
+    return result.sort_values('clics_totales', ascending=False)
+
+def top_rows(df: pd.DataFrame, n: int, columns) -> pd.DataFrame:
+    """
+    Las n filas mayores por columns, como nlargest, con los empates exactos
+    siempre en orden de aparición (nlargest con varias columnas no lo
+    garantiza y depende del resto de filas)
+    """
+    selected = df.nlargest(n, columns)
+    return selected.sort_index().sort_values(columns, ascending=False, kind='mergesort')
+
+def skyband(candidates: pd.DataFrame, k: int) -> pd.DataFrame:
+    """
+    Filas que pueden quedar entre las k primeras por RISK_RANKING para algún
+    umbral de clics. Una fila queda descartada si al menos k filas van delante
+    en el ranking con tantos o más clics: superan cualquier umbral que ella
+    supere. Las filas deben venir en orden de aparición
+    """
+    ordered = candidates.sort_values(RISK_RANKING, ascending=False, kind='mergesort')
+    keep = np.zeros(len(ordered), dtype=bool)
+
+    # Min-heap con los k mayores clics de las filas ya recorridas
+    heap = []
+    for i, clicks in enumerate(ordered['Clics'].tolist()):
+        if len(heap) < k:
+            keep[i] = True
+            heapq.heappush(heap, clicks)
+        elif heap[0] < clicks:
+            keep[i] = True
+            heapq.heapreplace(heap, clicks)
+
+    return ordered[keep].sort_index()
+
+class QuantileSketch:
+    """
+    Distribución de valores como pares (valor, peso) ordenados. Es exacta
+    mientras haya como mucho max_bins valores distintos; por encima agrupa
+    valores consecutivos en max_bins grupos de peso similar representados por
+    su media ponderada
+    """
+
+    def __init__(self, max_bins: int = SKETCH_MAX_BINS):
+        self.max_bins = max_bins
+        self.values = np.empty(0, dtype='float64')
+        self.weights = np.empty(0, dtype='int64')
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    def update(self, values) -> 'QuantileSketch':
+        """Añade los valores no nulos de una serie o array"""
+        values = pd.Series(values).to_numpy(dtype='float64', na_value=np.nan)
+        values = values[~np.isnan(values)]
+        unique, counts = np.unique(values, return_counts=True)
+        return self._combine(unique, counts)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        return self._combine(other.values, other.weights)
+
+    def quantile(self, q: float) -> float:
+        """Cuantil con interpolación lineal, como Series.quantile"""
+        total = self.count
+        if total == 0:
+            return np.nan
+
+        position = (total - 1) * q
+        lower = int(np.floor(position))
+        upper = min(lower + 1, total - 1)
+        ranks = np.cumsum(self.weights)
+        below, above = self.values[np.searchsorted(ranks, [lower, upper], side='right')]
+
+        # Misma interpolación que numpy para obtener resultados idénticos
+        t = position - lower
+        if t >= 0.5:
+            return above - (above - below) * (1 - t)
+        return below + (above - below) * t
+
+    def _combine(self, values: np.ndarray, weights: np.ndarray) -> 'QuantileSketch':
+        if len(values) == 0:
+            return self
+
+        all_values = np.concatenate([self.values, values])
+        unique, inverse = np.unique(all_values, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=np.concatenate([self.weights, weights]),
+                                   minlength=len(unique)).astype('int64')
+        self.values = unique
+
+        if len(self.values) > self.max_bins:
+            self._compact()
+        return self
+
+    def _compact(self) -> None:
+        """Agrupa valores consecutivos en max_bins grupos de peso similar"""
+        ranks = np.cumsum(self.weights) - self.weights
+        groups = (ranks * self.max_bins // self.weights.sum()).astype('int64')
+        weights = np.bincount(groups, weights=self.weights)
+        values = np.bincount(groups, weights=self.values * self.weights)
+
+        present = weights > 0
+        self.values = values[present] / weights[present]
+        self.weights = weights[present].astype('int64')
+
+class PartialMetrics:
+    """
+    Estado combinable de calculate_metrics. update() añade un bloque de filas
+    enriquecidas, merge() combina el estado de los bloques siguientes y
+    finalize() devuelve el mismo diccionario que calculate_metrics
+
+    Los bloques se deben añadir y combinar en el orden de las filas: los
+    empates de los rankings se resuelven por posición (ver top_rows)
+    """
+
+    def __init__(self, dimensions: List[Dict], max_bins: int = SKETCH_MAX_BINS):
+        self.dimensions = dimensions
+        self.rows = 0
+        self.total_clicks = 0
+        self.diff_sum = 0.0
+        self.diff_count = 0
+        self.diff_x_clicks = 0.0
+        self.segment_clicks = None
+        self.segment_order = None
+        self.dimension_partials = {spec['key']: None for spec in dimensions}
+        self.top_products = None
+        self.risk_candidates = None
+        self.opportunity_candidates = None
+        self.diff_sketch = QuantileSketch(max_bins)
+        self.clicks_sketch = QuantileSketch(max_bins)
+        self.match_column = None
+        self.productos_con_match = 0
+        self.productos_sin_match = 0
+        self.clics_con_match = 0
+        self.clics_sin_match = 0
+
+    def update(self, chunk: pd.DataFrame, match_column: Optional[str] = None) -> 'PartialMetrics':
+        """
+        Añade un bloque de filas enriquecidas. match_column es la columna que
+        indica si la fila tiene match del feed (ver _detect_merge_id_column)
+        """
+        other = PartialMetrics(self.dimensions, self.diff_sketch.max_bins)
+
+        # Posición global de cada fila para desempatar los rankings
+        chunk = chunk.set_axis(pd.RangeIndex(len(chunk)))
+        clicks = click_counts(chunk)
+        diff = chunk['price_diff_pct']
+
+        other.rows = len(chunk)
+        other.total_clicks = chunk['Clics'].sum()
+        other.diff_sum = diff.sum()
+        other.diff_count = int(diff.count())
+        other.diff_x_clicks = (diff * chunk['Clics']).sum()
+
+        other.segment_clicks = clicks.groupby(chunk['segmento_precio'], observed=True).sum()
+        other.segment_order = list(chunk['segmento_precio'].cat.categories)
+
+        for spec in self.dimensions:
+            other.dimension_partials[spec['key']] = dimension_partial(chunk, spec)
+
+        other.top_products = top_rows(chunk, TOP_PRODUCTS, 'Clics')
+        other.risk_candidates = skyband(chunk[(diff > 0) & chunk['Clics'].notna()], RISK_PRODUCTS)
+        other.opportunity_candidates = top_rows(chunk[diff < 0], OPPORTUNITY_PRODUCTS, OPPORTUNITY_RANKING)
+
+        other.diff_sketch.update(diff)
+        other.clicks_sketch.update(chunk['Clics'])
+
+        other.match_column = match_column
+        if match_column and match_column in chunk.columns:
+            has_match = chunk[match_column].notna()
+            other.productos_con_match = int(has_match.sum())
+            other.productos_sin_match = int((~has_match).sum())
+            other.clics_con_match = chunk.loc[has_match, 'Clics'].sum()
+            other.clics_sin_match = chunk.loc[~has_match, 'Clics'].sum()
+        else:
+            other.productos_con_match = len(chunk)
+            other.clics_con_match = chunk['Clics'].sum()
+
+        return self.merge(other)
+
+    def merge(self, other: 'PartialMetrics') -> 'PartialMetrics':
+        """Combina el estado de las filas que siguen a las de este estado"""
+        if other.rows == 0:
+            return self
+
+        offset = self.rows
+        self.rows += other.rows
+        self.total_clicks += other.total_clicks
+        self.diff_sum += other.diff_sum
+        self.diff_count += other.diff_count
+        self.diff_x_clicks += other.diff_x_clicks
+
+        self.segment_clicks = _sum_by_index(self.segment_clicks, other.segment_clicks)
+        self.segment_order = self.segment_order or other.segment_order
+
+        for key, partial in other.dimension_partials.items():
+            self.dimension_partials[key] = merge_dimension_partials(self.dimension_partials[key], partial)
+
+        self.top_products = top_rows(_concat_shifted(self.top_products, other.top_products, offset),
+                                     TOP_PRODUCTS, 'Clics')
+        self.risk_candidates = skyband(_concat_shifted(self.risk_candidates, other.risk_candidates, offset),
+                                       RISK_PRODUCTS)
+        self.opportunity_candidates = top_rows(
+            _concat_shifted(self.opportunity_candidates, other.opportunity_candidates, offset),
+            OPPORTUNITY_PRODUCTS, OPPORTUNITY_RANKING
+        )
+
+        self.diff_sketch.merge(other.diff_sketch)
+        self.clicks_sketch.merge(other.clicks_sketch)
+
+        self.match_column = self.match_column or other.match_column
+        self.productos_con_match += other.productos_con_match
+        self.productos_sin_match += other.productos_sin_match
+        self.clics_con_match += other.clics_con_match
+        self.clics_sin_match += other.clics_sin_match
+
+        return self
+
+    def finalize(self, total_productos_csv: Optional[int] = None, total_productos_feed: int = 0,
+                 productos_feed_descartados: int = 0) -> Dict:
+        """
+        Devuelve las métricas con la estructura de calculate_metrics. Sin
+        total_productos_csv se usan las filas añadidas
+        """
+        if self.rows == 0:
+            raise ValueError("No se han añadido datos a las métricas parciales")
+
+        total_clicks = self.total_clicks
+
+        # Distribución por segmento en el orden de las categorías
+        segment_dist = self.segment_clicks.reindex(
+            [segment for segment in self.segment_order if segment in self.segment_clicks.index]
+        )
+        segment_pct = (segment_dist / total_clicks * 100).round(1)
+
+        price_diff_stats = {
+            'media_simple': self.diff_sum / self.diff_count if self.diff_count else np.nan,
+            'mediana': self.diff_sketch.quantile(0.5),
+            'media_ponderada': self.diff_x_clicks / total_clicks
+        }
+
+        breakdowns = {
+            spec['key']: finalize_dimension(spec, self.dimension_partials[spec['key']])
+            for spec in self.dimensions
+        }
+
+        # Riesgo y oportunidades con el umbral de clics global
+        clicks_threshold = self.clicks_sketch.quantile(RISK_CLICKS_QUANTILE)
+        risk = self.risk_candidates
+        risk_products = top_rows(risk[risk['Clics'] > clicks_threshold], RISK_PRODUCTS, RISK_RANKING)
+        opportunities = self.opportunity_candidates
+        opportunity_products = top_rows(opportunities[opportunities['Clics'] > clicks_threshold],
+                                        OPPORTUNITY_PRODUCTS, OPPORTUNITY_RANKING)
+
+        total_csv = self.rows if total_productos_csv is None else total_productos_csv
+        data_quality = {
+            'total_productos_csv': total_csv,
+            'total_productos_feed': total_productos_feed,
+            'productos_feed_descartados': productos_feed_descartados,
+            'productos_con_match': self.productos_con_match,
+            'productos_sin_match': self.productos_sin_match,
+            'porcentaje_match': self.productos_con_match / total_csv * 100 if total_csv > 0 else 0,
+            'clics_con_match': self.clics_con_match,
+            'clics_sin_match': self.clics_sin_match
+        }
+        if not self.match_column:
+            data_quality['porcentaje_match'] = 100.0
+
+        return {
+            'globales': {
+                'total_clicks': total_clicks,
+                'total_productos': self.rows,
+                'segmento_distribucion': segment_pct.to_dict(),
+                'price_diff_stats': price_diff_stats
+            },
+            **breakdowns,
+            'top_productos': self.top_products,
+            'productos_riesgo': risk_products,
+            'oportunidades': opportunity_products,
+            'calidad_datos': data_quality
+        }
+
+def _sum_by_index(first, second):
+    """Suma dos series o DataFrames por índice conservando el orden de primera aparición"""
+    if first is None or second is None:
+        return second if first is None else first
+    combined = pd.concat([first, second])
+    return combined.groupby(level=list(range(combined.index.nlevels)), sort=False, observed=True).sum()
+
+def _concat_shifted(first: Optional[pd.DataFrame], second: pd.DataFrame, offset: int) -> pd.DataFrame:
+    """Concatena candidatos desplazando las posiciones del segundo bloque"""
+    second = second.set_axis(second.index + offset)
+    if first is None or second.empty:
+        return second if first is None else first
+    if first.empty:
+        return second
+    return pd.concat([first, second])
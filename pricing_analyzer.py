@@ -7,41 +7,289 @@ Procesa datos de Google Merchant Center y feed de productos para generar informe
 import pandas as pd
 import numpy as np
 import xml.etree.ElementTree as ET
+from lxml import etree
+import io
+import mmap
+import os
 import re
+import shutil
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 import json
-from typing import Dict, List, Tuple, Optional
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import logging
 
+from feed_cache import FeedCache
+from profiling import RunProfile, profiled
+from partial_metrics import (
+    PartialMetrics, click_counts, dimension_partial, finalize_dimension, top_rows,
+    TOP_PRODUCTS, RISK_PRODUCTS, OPPORTUNITY_PRODUCTS, RISK_CLICKS_QUANTILE,
+    RISK_RANKING, OPPORTUNITY_RANKING
+)
+
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Namespace de Google Shopping
+GOOGLE_NS = 'http://base.google.com/ns/1.0'
+
+# Items por bloque en el parseo incremental del feed
+FEED_CHUNK_SIZE = 20000
+
+# Filas por bloque en la lectura del CSV de competitividad y tipos explícitos de
+# sus columnas numéricas (Clics se lee como float y se compacta después). Los
+# precios se leen en float64: de ellos se derivan diferencias y precio_ajustado
+# y se exportan, y en float32 arrastrarían ruido de redondeo
+CSV_CHUNK_SIZE = 250000
+COMPETITIVENESS_DTYPES = {
+    'Tu precio': 'float64',
+    'Referencia': 'float64',
+    'Diferencia de precios': 'float64',
+    'Clics': 'float64',
+}
+
+# Opciones de lxml para leer el feed: sin resolver entidades, sin DTD ni red y
+# con los límites de tamaño por defecto (un feed no puede leer ficheros locales
+# ni inflarse con entidades anidadas)
+SAFE_XML_OPTIONS = {
+    'resolve_entities': False,
+    'no_network': True,
+    'load_dtd': False,
+    'huge_tree': False,
+}
+
+# Parseo paralelo del feed: rangos de bytes por proceso, tamaño mínimo de cada
+# rango y marcas de inicio y fin de <item> con las que se alinean los rangos
+FEED_RANGES_PER_WORKER = 4
+FEED_MIN_RANGE_BYTES = 4 * 1024 ** 2
+# Bloque con el que se vuelca a un fichero temporal un feed que no está en disco
+FEED_COPY_BLOCK_BYTES = 16 * 1024 ** 2
+ITEM_START_PATTERN = re.compile(rb'<item[\s>]')
+ITEM_END = b'</item>'
+
+# Nombre del índice del feed con los IDs normalizados para el enriquecimiento
+FEED_ID_INDEX = 'id_normalizado'
+
+# IDs de ejemplo que se muestran en el informe de emparejamiento
+ID_REPORT_SAMPLE = 5
+
+# Columnas del feed que preceden y siguen a los atributos de g:product_detail
+FEED_LEADING_COLUMNS = [
+    'product_id', 'title', 'description', 'link', 'image_link', 'availability',
+    'price', 'sale_price', 'brand', 'gtin', 'mpn'
+]
+FEED_TRAILING_COLUMNS = [
+    'custom_label_2', 'custom_label_3', 'custom_label_4', 'custom_label_5',
+    'dimensions', 'pattern'
+]
+
+def _g(tag: str) -> str:
+    """Etiqueta de Google Shopping en notación {namespace}tag"""
+    return f'{{{GOOGLE_NS}}}{tag}'
+
+# Etiqueta con namespace -> columna del DataFrame
+FEED_FIELD_TAGS = {
+    _g('id'): 'product_id',
+    _g('title'): 'title',
+    _g('description'): 'description',
+    _g('link'): 'link',
+    _g('image_link'): 'image_link',
+    _g('availability'): 'availability',
+    _g('price'): 'price',
+    _g('sale_price'): 'sale_price',
+    _g('brand'): 'brand',
+    _g('gtin'): 'gtin',
+    _g('mpn'): 'mpn',
+    _g('custom_label_2'): 'custom_label_2',
+    _g('custom_label_3'): 'custom_label_3',
+    _g('custom_label_4'): 'custom_label_4',
+    _g('custom_label_5'): 'custom_label_5',
+    _g('dimensions'): 'dimensions',
+    _g('pattern'): 'pattern',
+}
+ID_TAG = _g('id')
+PRODUCT_DETAIL_TAG = _g('product_detail')
+SECTION_NAME_TAG = _g('section_name')
+ATTRIBUTE_NAME_TAG = _g('attribute_name')
+ATTRIBUTE_VALUE_TAG = _g('attribute_value')
+
+def _keywords(*words: str) -> str:
+    """Expresión regular que encuentra cualquiera de las palabras como subcadena"""
+    return '|'.join(re.escape(word) for word in words)
+
+# Reglas de inferencia desde el título: columna -> ([(valor, patrón)] por prioridad, valor por defecto)
+TITLE_INFERENCE_RULES = {
+    'category_inferred': ([
+        ('turismo', _keywords('turismo', 'touring', 'passenger')),
+        ('4x4', _keywords('4x4', 'suv', '4x2', 'off-road', 'all terrain')),
+        ('furgoneta', _keywords('furgoneta', 'van', 'camion', 'cargo')),
+        ('moto', _keywords('moto', 'motorcycle')),
+    ], 'otro'),
+    'vehicle_type': ([
+        ('coche', _keywords('coche', 'turismo')),
+        ('suv', _keywords('suv', '4x4')),
+        ('furgoneta', _keywords('furgoneta')),
+    ], 'desconocido'),
+    'season': ([
+        ('invierno', _keywords('invierno', 'winter')),
+        ('verano', _keywords('verano', 'summer')),
+        ('all_season', _keywords('all season', '4 estaciones')),
+    ], 'desconocida'),
+}
+
+# Segmentos de precio ordenados de más barato a más caro y sus umbrales (% de diferencia)
+PRICE_SEGMENTS = ['MUCHO_MAS_BARATO', 'BARATO', 'ALINEADO', 'CARO', 'MUCHO_MAS_CARO']
+PRICE_SEGMENT_THRESHOLDS = (-5, -1, 1, 5)
+
+# Columnas del feed que consumen calculate_metrics y ReportGenerator. La
+# exportación CSV incluye todas las columnas del feed, así que esta proyección
+# solo se usa en los caminos que no exportan (iter_enriched_chunks, run_pipeline)
+DOWNSTREAM_FEED_COLUMNS = (
+    'title', 'link', 'availability', 'brand', 'brand_standardized',
+    'price_num', 'price_currency', 'sale_price_num', 'sale_price_currency',
+    'custom_label_2', 'custom_label_3', 'custom_label_4', 'custom_label_5', 'dimensions',
+    'category_inferred', 'vehicle_type', 'season',
+    'medida_final', 'modelo_limpio', 'temporada_limpia', 'vehiculo_final', 'segmento_quality'
+)
+
+# Columnas en bruto del feed de las que se deriva cada columna estandarizada;
+# el resto de columnas de salida se corresponden con un único campo del mismo nombre
+FEED_DERIVED_SOURCES = {
+    'brand_standardized': ('brand',),
+    'price_num': ('price',),
+    'price_currency': ('price',),
+    'sale_price_num': ('sale_price',),
+    'sale_price_currency': ('sale_price',),
+    'category_inferred': ('title',),
+    'vehicle_type': ('title',),
+    'season': ('title',),
+    'medida_final': ('section_general_medida', 'dimensions'),
+    'modelo_limpio': ('section_general_modelo',),
+    'temporada_limpia': ('section_general_temporada',),
+    'vehiculo_final': ('section_general_vehículo', 'custom_label_2'),
+    'segmento_quality': ('custom_label_3',),
+}
+
+# Tipos compactos declarados por columna, aplicados al parsear y al enriquecer:
+# 'category' para columnas de baja cardinalidad e 'int32' para recuentos (los
+# recuentos con nulos o decimales se dejan en float64). Los precios se quedan
+# en float64 porque de ellos se derivan y exportan otros valores
+COLUMN_SCHEMA = {
+    # CSV de competitividad
+    'Marca': 'category',
+    'Tu precio': 'float64',
+    'Referencia': 'float64',
+    'Clics': 'int32',
+    # Feed de productos
+    'availability': 'category',
+    'brand': 'category',
+    'brand_standardized': 'category',
+    'price_num': 'float64',
+    'price_currency': 'category',
+    'sale_price_num': 'float64',
+    'sale_price_currency': 'category',
+    'custom_label_2': 'category',
+    'custom_label_3': 'category',
+    'custom_label_4': 'category',
+    'custom_label_5': 'category',
+    'category_inferred': 'category',
+    'vehicle_type': 'category',
+    'season': 'category',
+    'medida_limpia': 'category',
+    'modelo_limpio': 'category',
+    'temporada_limpia': 'category',
+    'vehiculo_limpio': 'category',
+    'vehiculo_custom': 'category',
+    'segmento_quality': 'category',
+    'medida_dimensions': 'category',
+    'medida_final': 'category',
+    'vehiculo_final': 'category',
+    # Datos enriquecidos
+    'marca_final': 'category',
+}
+
+# Desgloses de calculate_metrics: clave del resultado, columna, etiqueta de salida,
+# longitud mínima del valor y clics mínimos (estrictamente superiores) por valor.
+# Los desgloses 'detailed' incluyen la diferencia media simple y los segmentos
+DIMENSION_BREAKDOWNS = [
+    {'key': 'marcas', 'column': 'Marca', 'label': 'marca', 'detailed': True},
+    {'key': 'categorias', 'column': 'category_inferred', 'label': 'categoria'},
+    {'key': 'medidas', 'column': 'medida_final', 'label': 'medida', 'min_length': 4, 'min_clicks': 50},
+    {'key': 'modelos', 'column': 'modelo_limpio', 'label': 'modelo', 'min_length': 2, 'min_clicks': 30},
+    {'key': 'temporadas', 'column': 'temporada_limpia', 'label': 'temporada', 'min_length': 3},
+    {'key': 'vehiculos', 'column': 'vehiculo_final', 'label': 'vehiculo', 'min_length': 3},
+    {'key': 'quality_segments', 'column': 'segmento_quality', 'label': 'quality', 'min_length': 2},
+]
+
 class PricingAnalyzer:
-    def __init__(self):
+    def __init__(self, feed_cache: Optional[FeedCache] = None, profile: Optional[RunProfile] = None):
+        self.feed_cache = feed_cache
+        # Medidas de cada etapa (ver profiling); con profile=None no se mide nada, para
+        # que un analizador reutilizado no acumule etapas de una ejecución a otra
+        self.profile = profile
         self.competitiveness_data = None
         self.feed_data = None
         self.enriched_data = None
         self.date_range = None
-
-    def parse_competitiveness_csv(self, csv_content: str) -> pd.DataFrame:
+        self.id_match_report = None
+        self.feed_items_read = 0
+        self.feed_items_skipped = 0
+        self.stage_timings = {}
+        self._detail_columns = {}
+
+    @profiled('csv')
+    def parse_competitiveness_csv(self, csv_content, chunk_size: int = CSV_CHUNK_SIZE) -> pd.DataFrame:
         """
         Parsea el CSV de competitividad de Google Merchant Center
-        """
-        import io
 
-        lines = csv_content.strip().split('\n')
+        Acepta str, bytes o un objeto tipo fichero. Solo se leen como texto las
+        dos líneas de cabecera; pandas lee el resto directamente del flujo de
+        bytes en bloques de chunk_size filas con los tipos de
+        COMPETITIVENESS_DTYPES. Si alguna columna numérica trae valores no
+        numéricos, se relee sin tipos y se convierten con coerción a NaN.
 
-        # Extraer rango de fechas de la segunda línea
-        date_line = lines[1].strip('"')
-        self.date_range = date_line
+        El resultado es el CSV completo en memoria, así que la memoria crece
+        con el número de filas (ver _read_csv_chunks). Para procesar el CSV con
+        memoria acotada está iter_enriched_chunks.
+        """
+        stream = self._open_competitiveness_csv(csv_content)
 
         # Parsear CSV a partir de la tercera línea
-        csv_data = '\n'.join(lines[2:])
+        data_start = stream.tell()
+        try:
+            df = self._read_csv_chunks(stream, chunk_size, COMPETITIVENESS_DTYPES)
+        except ValueError:
+            stream.seek(data_start)
+            df = self._read_csv_chunks(stream, chunk_size)
+
+        df = self._prepare_competitiveness(df)
+
+        self.competitiveness_data = df
+        print(f"CSV de competitividad cargado: {len(df)} productos")
+        return df
+
+    def _open_competitiveness_csv(self, csv_content):
+        """
+        Devuelve el CSV como flujo de bytes situado al inicio de los datos,
+        tras leer el título y el rango de fechas (en date_range)
+        """
+        stream = self._as_byte_stream(csv_content)
+
+        # Primera línea no vacía: título del informe
+        title_line = stream.readline()
+        while title_line and not title_line.strip():
+            title_line = stream.readline()
 
-        # Usar io.StringIO para leer el CSV
-        df = pd.read_csv(io.StringIO(csv_data))
+        # Extraer rango de fechas de la segunda línea
+        self.date_range = stream.readline().decode('utf-8').strip().strip('"')
+        return stream
 
+    def _prepare_competitiveness(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Tipifica las columnas del CSV y añade la diferencia en porcentaje y el segmento"""
         # Limpiar y tipificar columnas
         df['Tu precio'] = pd.to_numeric(df['Tu precio'], errors='coerce')
         df['Referencia'] = pd.to_numeric(df['Referencia'], errors='coerce')
@@ -52,76 +300,367 @@ class PricingAnalyzer:
         df['price_diff_pct'] = df['Diferencia de precios'] * 100
 
         # Crear segmento de precio
-        df['segmento_precio'] = df['price_diff_pct'].apply(self._get_price_segment)
+        df['segmento_precio'] = self._segment_prices(df['price_diff_pct'])
 
-        self.competitiveness_data = df
-        print(f"CSV de competitividad cargado: {len(df)} productos")
-        return df
+        return self._apply_schema(df)
 
-    def parse_product_feed_xml(self, xml_content: str) -> pd.DataFrame:
+    def _read_csv_chunks(self, stream, chunk_size: int, dtype: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Lee el resto del flujo CSV por bloques y los concatena. Los bloques
+        evitan copias del texto del CSV, pero no acotan la memoria: al
+        concatenar conviven con el resultado. Las cadenas se comparten y solo
+        se duplican los arrays numéricos y de punteros (8 bytes por celda)
+        """
+        with pd.read_csv(stream, encoding='utf-8', dtype=dtype, chunksize=chunk_size) as reader:
+            chunks = list(reader)
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+    @profiled('feed', rows_in=lambda self, *args, **kwargs: self.feed_data.attrs.get('feed_total_items'))
+    def parse_product_feed_xml(self, xml_content, streaming: bool = True,
+                               chunk_size: int = FEED_CHUNK_SIZE,
+                               id_filter: Optional[set] = None,
+                               columns: Optional[Tuple[str, ...]] = None,
+                               workers: int = 1, content_key: Optional[str] = None) -> pd.DataFrame:
         """
         Parsea el feed de productos en formato XML
+
+        Acepta str, bytes o un objeto tipo fichero. Por defecto el feed se lee
+        en modo streaming (lxml.iterparse), liberando cada <item> tras extraerlo,
+        de modo que la memoria no crece con el tamaño del XML. Con
+        streaming=False se construye el árbol completo como antes.
+
+        Si el analizador tiene una caché de feeds, un feed con el mismo
+        contenido ya parseado se carga desde disco sin volver a leer el XML.
+        content_key es la huella del contenido (FeedCache.fingerprint) si el
+        llamador ya la tiene; si no, se calcula leyendo el feed.
+
+        El feed resultante queda indexado por su ID normalizado (FEED_ID_INDEX),
+        índice que también se guarda en la caché.
+
+        Con id_filter (IDs normalizados, p. ej. competitiveness_id_set()) solo
+        se extraen los items cuyo g:id está en el conjunto; el resto se descarta
+        nada más leer su ID. Los items leídos y descartados quedan en
+        feed_data.attrs ('feed_total_items', 'feed_skipped_items').
+
+        Con columns (p. ej. DOWNSTREAM_FEED_COLUMNS) solo se extraen los campos
+        del XML necesarios para esas columnas de salida, según
+        FEED_DERIVED_SOURCES; descripciones, imágenes y demás atributos no
+        llegan a materializarse.
+
+        Con workers > 1 (y streaming) el XML se reparte en rangos de bytes
+        alineados con <item> que se parsean en un pool de procesos; el
+        resultado es el mismo que el del parseo secuencial. El feed se mapea
+        desde disco (si no es un fichero, se vuelca antes a uno temporal) y
+        los procesos solo reciben los offsets de sus rangos.
         """
-        # Registrar el namespace de Google Shopping
-        ns = {'g': 'http://base.google.com/ns/1.0'}
-        root = ET.fromstring(xml_content)
+        fields = self._feed_source_fields(columns) if columns is not None else None
+
+        cache_keys = []
+        if self.feed_cache is not None:
+            if content_key is None:
+                content_key = self.feed_cache.fingerprint(xml_content)
+            cache_keys.append(content_key)
+            variant_key = content_key
+            if id_filter is not None:
+                variant_key = self.feed_cache.variant(variant_key, id_filter)
+            if fields is not None:
+                variant_key = self.feed_cache.variant(variant_key, fields)
+            if variant_key != content_key:
+                cache_keys.append(variant_key)
+
+            # El feed completo sirve para cualquier filtro o proyección; si no está, se busca la variante
+            for cache_key in cache_keys:
+                cached = self.feed_cache.get(cache_key)
+                if cached is not None:
+                    cached = self._index_feed(self._apply_schema(cached))
+                    cached.attrs.setdefault('feed_total_items', len(cached))
+                    cached.attrs.setdefault('feed_skipped_items', 0)
+                    self.feed_data = cached
+                    print(f"Feed de productos cargado desde caché: {len(cached)} productos")
+                    return cached
+
+        if streaming and workers > 1:
+            df = self._parse_feed_parallel(xml_content, workers, chunk_size, id_filter, fields)
+        elif streaming:
+            df = self._parse_feed_stream(xml_content, chunk_size, id_filter, fields)
+        else:
+            df = self._parse_feed_tree(xml_content, id_filter, fields)
 
-        products = []
-        for item in root.findall('.//item'):
-            product = {}
-
-            # Campos estándar de Google Shopping usando namespace
-            product['product_id'] = self._get_xml_text_with_ns(item, 'g:id', ns)
-            product['title'] = self._get_xml_text_with_ns(item, 'g:title', ns)
-            product['description'] = self._get_xml_text_with_ns(item, 'g:description', ns)
-            product['link'] = self._get_xml_text_with_ns(item, 'g:link', ns)
-            product['image_link'] = self._get_xml_text_with_ns(item, 'g:image_link', ns)
-            product['availability'] = self._get_xml_text_with_ns(item, 'g:availability', ns)
-            product['price'] = self._get_xml_text_with_ns(item, 'g:price', ns)
-            product['sale_price'] = self._get_xml_text_with_ns(item, 'g:sale_price', ns)
-            product['brand'] = self._get_xml_text_with_ns(item, 'g:brand', ns)
-            product['gtin'] = self._get_xml_text_with_ns(item, 'g:gtin', ns)
-            product['mpn'] = self._get_xml_text_with_ns(item, 'g:mpn', ns)
-
-            # Extraer información adicional de product_detail
-            product_details = item.findall('.//g:product_detail', ns)
-            for detail in product_details:
-                section_name = self._get_xml_text_with_ns(detail, 'g:section_name', ns)
-                attribute_name = self._get_xml_text_with_ns(detail, 'g:attribute_name', ns)
-                attribute_value = self._get_xml_text_with_ns(detail, 'g:attribute_value', ns)
+        df = self._index_feed(self._apply_schema(self._standardize_feed(df)))
+        df.attrs['feed_total_items'] = self.feed_items_read
+        df.attrs['feed_skipped_items'] = self.feed_items_skipped
 
-                if attribute_name and attribute_value:
-                    # Guardar información estructurada por sección y atributo
-                    if section_name:
-                        product[f'section_{section_name.lower()}_{attribute_name.lower()}'] = attribute_value
-                    else:
-                        product[f'attribute_{attribute_name.lower()}'] = attribute_value
+        if cache_keys:
+            self.feed_cache.put(cache_keys[-1], df)
 
-            # Extraer custom labels
-            product['custom_label_2'] = self._get_xml_text_with_ns(item, 'g:custom_label_2', ns)
-            product['custom_label_3'] = self._get_xml_text_with_ns(item, 'g:custom_label_3', ns)
-            product['custom_label_4'] = self._get_xml_text_with_ns(item, 'g:custom_label_4', ns)
-            product['custom_label_5'] = self._get_xml_text_with_ns(item, 'g:custom_label_5', ns)
+        self.feed_data = df
+        print(f"Feed de productos cargado: {len(df)} productos")
+        if self.feed_items_skipped:
+            print(f"Items del feed descartados por no estar en el CSV: {self.feed_items_skipped}/{self.feed_items_read}")
+        return df
 
-            # Extraer dimensions y pattern
-            product['dimensions'] = self._get_xml_text_with_ns(item, 'g:dimensions', ns)
-            product['pattern'] = self._get_xml_text_with_ns(item, 'g:pattern', ns)
+    def competitiveness_id_set(self) -> set:
+        """IDs normalizados del CSV de competitividad, para filtrar el feed al parsearlo"""
+        if self.competitiveness_data is None:
+            raise ValueError("Debes cargar el CSV de competitividad antes de filtrar el feed")
 
-            # Intentar extraer categorías del título
-            if product['title']:
-                product['category_inferred'] = self._infer_category_from_title(product['title'])
-                product['vehicle_type'] = self._infer_vehicle_type(product['title'])
-                product['season'] = self._infer_season(product['title'])
+        comp_id_col = self._detect_id_column(self.competitiveness_data)
+        return {self._normalize_id(value) for value in self.competitiveness_data[comp_id_col]}
 
-            # Limpiar precios
-            for price_field in ['price', 'sale_price']:
-                if product[price_field]:
-                    product[f'{price_field}_num'] = self._extract_price(product[price_field])
-                    product[f'{price_field}_currency'] = self._extract_currency(product[price_field])
+    def _feed_source_fields(self, columns) -> set:
+        """Campos en bruto del feed necesarios para producir las columnas indicadas"""
+        fields = {'product_id'}
+        for column in columns:
+            fields.update(FEED_DERIVED_SOURCES.get(column, (column,)))
+        return fields
 
-            products.append(product)
+    def iter_product_feed_chunks(self, xml_content, chunk_size: int = FEED_CHUNK_SIZE,
+                                 id_filter: Optional[set] = None, fields: Optional[set] = None):
+        """
+        Recorre el feed de forma incremental y genera bloques columnares
+        (DataFrames de hasta chunk_size filas) sin estandarizar. Con id_filter
+        se omiten los items cuyo ID normalizado no está en el conjunto y con
+        fields solo se extraen esos campos
+        """
+        columns = {}
+        n_rows = 0
+        self.feed_items_read = 0
+        self.feed_items_skipped = 0
+
+        for _, item in etree.iterparse(self._as_byte_stream(xml_content), events=('end',), tag='item',
+                                       **SAFE_XML_OPTIONS):
+            self.feed_items_read += 1
+            keep = id_filter is None or self._item_id(item) in id_filter
+            product = self._extract_feed_item(item, fields) if keep else None
+
+            # Liberar el item y los hermanos ya procesados
+            item.clear()
+            while item.getprevious() is not None:
+                del item.getparent()[0]
+
+            if product is None:
+                self.feed_items_skipped += 1
+                continue
+
+            for key, value in product.items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = [np.nan] * n_rows
+                column.append(value)
+            n_rows += 1
+
+            # Rellenar columnas que este item no tiene
+            for column in columns.values():
+                if len(column) < n_rows:
+                    column.append(np.nan)
+
+            if n_rows >= chunk_size:
+                yield pd.DataFrame(columns)
+                columns = {}
+                n_rows = 0
+
+        if n_rows:
+            yield pd.DataFrame(columns)
+
+    def _parse_feed_parallel(self, xml_content, workers: int, chunk_size: int,
+                             id_filter: Optional[set], fields: Optional[set]) -> pd.DataFrame:
+        """
+        Parsea los rangos del feed en un pool de procesos con la misma extracción
+        que el parseo secuencial y concatena los bloques en el orden original.
+        La estandarización (incluida la inferencia desde el título) se hace
+        después sobre el feed completo.
+
+        El feed no se copia en memoria: el proceso principal mapea el fichero
+        para buscar los límites de los rangos y cada proceso del pool lo mapea
+        también y lee su rango entre la cabecera y el cierre del documento
+        """
+        with _feed_file(xml_content) as (path, offset), open(path, 'rb') as source:
+            source.seek(offset)
+            if os.fstat(source.fileno()).st_size <= offset:
+                return self._parse_feed_stream(source, chunk_size, id_filter, fields)
+
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                prefix, ranges, suffix = self._split_feed_ranges(data, offset, workers * FEED_RANGES_PER_WORKER)
+            if len(ranges) < 2:
+                return self._parse_feed_stream(source, chunk_size, id_filter, fields)
+
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_feed_worker,
+                                         initargs=(path, prefix, suffix, chunk_size, id_filter, fields)) as pool:
+                    results = list(pool.map(_parse_feed_range, ranges))
+            except ValueError as e:
+                # Un '<item>' literal (p. ej. dentro de CDATA) puede desalinear los rangos
+                print(f"No se pudo parsear el feed en paralelo ({e}); se parsea de forma secuencial")
+                return self._parse_feed_stream(source, chunk_size, id_filter, fields)
+
+        self.feed_items_read = sum(items_read for _, items_read, _ in results)
+        self.feed_items_skipped = sum(items_skipped for _, _, items_skipped in results)
+
+        frames = [df for df, _, _ in results if len(df.columns)]
+        return pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+
+    def _parse_feed_stream(self, xml_content, chunk_size: int, id_filter: Optional[set],
+                           fields: Optional[set]) -> pd.DataFrame:
+        """Parseo incremental secuencial: concatena los bloques de iter_product_feed_chunks"""
+        chunks = list(self.iter_product_feed_chunks(xml_content, chunk_size, id_filter, fields))
+        return pd.concat(chunks, ignore_index=True, sort=False) if chunks else pd.DataFrame()
+
+    def _split_feed_ranges(self, data, start: int, n_ranges: int) -> Tuple[bytes, List[Tuple[int, int]], bytes]:
+        """
+        Divide el feed (bytes o mmap, desde el offset start) en hasta n_ranges
+        rangos (inicio, fin) de items completos. Devuelve también la cabecera
+        del feed (declaración, <rss> con sus namespaces y <channel>) y el cierre
+        del documento, que cada rango necesita para ser un XML válido
+        """
+        first_item = ITEM_START_PATTERN.search(data, start)
+        body_end = data.rfind(ITEM_END, start)
+        if first_item is None or body_end < 0:
+            return b'', [], b''
+
+        body_start = first_item.start()
+        body_end += len(ITEM_END)
+        prefix, suffix = data[start:body_start], data[body_end:]
+        range_size = max(FEED_MIN_RANGE_BYTES, (body_end - body_start) // n_ranges + 1)
+
+        # Cada rango empieza en el primer <item> tras el tamaño objetivo
+        bounds = [body_start]
+        while True:
+            next_item = ITEM_START_PATTERN.search(data, bounds[-1] + range_size, body_end)
+            if next_item is None:
+                break
+            bounds.append(next_item.start())
+        bounds.append(body_end)
+
+        return prefix, list(zip(bounds, bounds[1:])), suffix
+
+    def _parse_feed_tree(self, xml_content, id_filter: Optional[set] = None,
+                         fields: Optional[set] = None) -> pd.DataFrame:
+        """Parsea el feed construyendo el árbol XML completo en memoria"""
+        if hasattr(xml_content, 'read'):
+            xml_content = xml_content.read()
 
-        df = pd.DataFrame(products)
+        root = ET.fromstring(xml_content)
+
+        items = root.findall('.//item')
+        self.feed_items_read = len(items)
+        if id_filter is not None:
+            items = [item for item in items if self._item_id(item) in id_filter]
+        self.feed_items_skipped = self.feed_items_read - len(items)
+
+        products = [self._extract_feed_item(item, fields) for item in items]
+        return pd.DataFrame(products)
+
+    def _as_byte_stream(self, content):
+        """Devuelve un flujo binario legible a partir de str, bytes o fichero"""
+        if hasattr(content, 'read'):
+            return content
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return io.BytesIO(content)
+
+    def _item_id(self, item) -> str:
+        """ID normalizado de un <item>, leído antes de extraer el resto de campos"""
+        element = item.find(ID_TAG)
+        return self._normalize_id(element.text if element is not None else '')
+
+    def _extract_feed_item(self, item, fields: Optional[set] = None) -> Dict:
+        """Extrae los campos de un <item> del feed (todos o solo fields) como diccionario"""
+        product = self._extract_feed_fields(item, fields)
+
+        # Limpiar precios
+        for price_field in ['price', 'sale_price']:
+            if product.get(price_field):
+                product[f'{price_field}_num'] = self._extract_price(product[price_field])
+                product[f'{price_field}_currency'] = self._extract_currency(product[price_field])
+
+        return product
+
+    def _extract_feed_fields(self, item, fields: Optional[set] = None) -> Dict:
+        """
+        Extrae los campos de texto de un <item> recorriendo sus hijos una sola
+        vez y despachando cada etiqueta con la tabla FEED_FIELD_TAGS. Con fields
+        se ignoran los campos y atributos de product_detail que no estén en él
+        """
+        values = {}
+        details = {}
+
+        for child in item:
+            tag = child.tag
+            column = FEED_FIELD_TAGS.get(tag)
+            if column is not None:
+                if column not in values and (fields is None or column in fields):
+                    values[column] = child.text
+            elif tag == PRODUCT_DETAIL_TAG:
+                parts = {}
+                for part in child:
+                    parts.setdefault(part.tag, part.text)
+
+                attribute_name = parts.get(ATTRIBUTE_NAME_TAG)
+                attribute_value = parts.get(ATTRIBUTE_VALUE_TAG)
+                if attribute_name and attribute_value:
+                    # Guardar información estructurada por sección y atributo
+                    column = self._detail_column(parts.get(SECTION_NAME_TAG), attribute_name)
+                    if column not in details and (fields is None or column in fields):
+                        details[column] = attribute_value
+
+        # Mantener el orden de columnas: campos estándar, product_detail y el resto
+        product = {
+            column: values.get(column, '') for column in FEED_LEADING_COLUMNS
+            if fields is None or column in fields
+        }
+        product.update(details)
+        for column in FEED_TRAILING_COLUMNS:
+            if fields is None or column in fields:
+                product[column] = values.get(column, '')
+
+        return product
+
+    def _detail_column(self, section_name: str, attribute_name: str) -> str:
+        """Nombre de columna para un par sección/atributo de g:product_detail"""
+        key = (section_name, attribute_name)
+        column = self._detail_columns.get(key)
+        if column is None:
+            if section_name:
+                column = f'section_{section_name.lower()}_{attribute_name.lower()}'
+            else:
+                column = f'attribute_{attribute_name.lower()}'
+            self._detail_columns[key] = column
+        return column
+
+    def _infer_from_titles(self, titles: pd.Series) -> Dict[str, pd.Series]:
+        """
+        Infiere categoría, tipo de vehículo y temporada de todos los títulos a la vez.
+        Las reglas se evalúan una vez por título distinto (los feeds repiten muchos
+        títulos) y el resultado se lleva a cada fila con sus códigos. Cada regla es
+        una expresión regular alternativa y np.select respeta el orden de prioridad
+        de TITLE_INFERENCE_RULES
+        """
+        codes, uniques = pd.factorize(titles)
+        uniques_lower = pd.Series(uniques, dtype='string[pyarrow]').str.lower()
+        # Títulos vacíos o nulos (código -1, el NaN añadido al final): sin inferencia
+        empty = (uniques_lower == '').to_numpy(dtype=bool, na_value=True)
+
+        inferred = {}
+        for column, (rules, default) in TITLE_INFERENCE_RULES.items():
+            conditions = [
+                uniques_lower.str.contains(pattern).to_numpy(dtype=bool, na_value=False)
+                for _, pattern in rules
+            ]
+            values = np.select(conditions, [label for label, _ in rules], default).astype(object)
+            values[empty] = np.nan
+            inferred[column] = pd.Series(np.append(values, np.nan).take(codes), index=titles.index)
+
+        return inferred
+
+    def _standardize_feed(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Estandariza marcas, medidas y vehículos del feed ya tabulado"""
+        # Inferir categorías del título sobre la columna completa
+        if 'title' in df.columns:
+            # Tras los campos finales del item (pattern si no se ha proyectado fuera)
+            trailing = [column for column in FEED_TRAILING_COLUMNS if column in df.columns]
+            position = df.columns.get_loc(trailing[-1]) + 1 if trailing else len(df.columns)
+            for offset, (column, values) in enumerate(self._infer_from_titles(df['title']).items()):
+                df.insert(position + offset, column, values)
 
         # Estandarizar marcas
         df['brand_standardized'] = df['brand'].astype(str).str.strip().str.upper() if 'brand' in df.columns else None
@@ -158,14 +697,17 @@ class PricingAnalyzer:
         elif 'vehiculo_custom' in df.columns:
             df['vehiculo_final'] = df['vehiculo_custom']
 
-        self.feed_data = df
-        print(f"Feed de productos cargado: {len(df)} productos")
         return df
 
-    def enrich_data(self) -> pd.DataFrame:
+    @profiled('enriquecimiento', rows_in=lambda self, *args, **kwargs: len(self.competitiveness_data))
+    def enrich_data(self, feed_columns: Optional[Tuple[str, ...]] = None) -> pd.DataFrame:
         """
         Enriquece los datos de competitividad con información del feed
         Compatible con múltiples formatos de feeds
+
+        Por defecto se incorporan todas las columnas del feed (el resultado es
+        el dataset que se exporta); con feed_columns (p. ej.
+        DOWNSTREAM_FEED_COLUMNS) solo esas
         """
         if self.competitiveness_data is None or self.feed_data is None:
             raise ValueError("Debes cargar ambos datasets antes de enriquecer")
@@ -176,29 +718,65 @@ class PricingAnalyzer:
 
         print(f"Columnas de ID detectadas: CSV='{comp_id_col}', Feed='{feed_id_col}'")
 
-        # Preparar datos para merge robusto
-        comp_data = self.competitiveness_data.copy()
-        feed_data = self.feed_data.copy()
-
-        # Convertir IDs a string para comparación
-        comp_data['_merge_key'] = comp_data[comp_id_col].astype(str).str.strip().str.upper()
-        feed_data['_merge_key'] = feed_data[feed_id_col].astype(str).str.strip().str.upper()
-
-        # Merge usando claves estandarizadas
-        merged = comp_data.merge(
-            feed_data.drop(columns=[feed_id_col]),  # Eliminar columna original del feed
-            left_on='_merge_key',
-            right_on='_merge_key',
-            how='left',
-            suffixes=('_merchant', '_feed')
-        )
+        comp_data = self.competitiveness_data
+        feed_data = self._index_feed(self.feed_data)
+        merged, matched = self._enrich_frame(comp_data, comp_id_col, feed_data, feed_id_col, feed_columns)
+
+        self.enriched_data = merged
+        print(f"Datos enriquecidos: {len(merged)} productos con match")
 
-        # Limpiar columna temporal
-        merged.drop(columns=['_merge_key'], inplace=True)
+        # Reportar calidad de datos
+        self.id_match_report = self._build_id_match_report(comp_data[comp_id_col], matched, feed_data.index)
+        report = self.id_match_report
+        total = len(comp_data)
+        unmatched = report['productos_sin_match']
+        print(f"Productos sin match en feed: {unmatched}/{total} ({unmatched/total*100 if total else 0:.1f}%)")
+        if unmatched:
+            print(f"  Ejemplos sin match: {report['ids_sin_match'][:ID_REPORT_SAMPLE]}")
+        if report['ids_duplicados_feed']:
+            print(f"IDs duplicados en el feed: {len(report['ids_duplicados_feed'])} "
+                  f"(ejemplos: {report['ids_duplicados_feed'][:ID_REPORT_SAMPLE]})")
+
+        return merged
+
+    def _enrich_frame(self, comp_data: pd.DataFrame, comp_id_col: str, feed_data: pd.DataFrame,
+                      feed_id_col: str, feed_columns: Optional[Tuple[str, ...]]) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Une un bloque del CSV con el feed indexado y añade las columnas
+        derivadas. Devuelve el resultado y qué filas del CSV tienen match
+        """
+        # Clave estandarizada del CSV como Series independiente; el feed ya está indexado por la suya
+        comp_key = self._normalize_ids(comp_data[comp_id_col])
+        feed_ids = feed_data.index
+
+        # Proyectar solo las columnas del feed que se usan después (sin la columna de ID original)
+        projected_columns = [
+            col for col in feed_data.columns
+            if col != feed_id_col and (feed_columns is None or col in feed_columns)
+        ]
+
+        if feed_ids.is_unique:
+            # Búsqueda en el índice: posición de cada ID del CSV en el feed (-1 sin match)
+            positions = feed_ids.get_indexer(comp_key)
+            matched = positions >= 0
+            feed_part = feed_data[projected_columns].reset_index(drop=True).reindex(positions)
+            merged = self._join_columns(comp_data, feed_part.set_axis(comp_data.index))
+        else:
+            # Con IDs duplicados en el feed se mantiene la semántica del merge (una fila por coincidencia)
+            matched = comp_key.isin(feed_ids).to_numpy()
+            merged = comp_data.merge(
+                feed_data[projected_columns],
+                left_on=comp_key,
+                right_on=feed_ids.to_numpy(),
+                how='left',
+                suffixes=('_merchant', '_feed')
+            )
+            # Limpiar la columna de clave que añade pandas al usar arrays como claves
+            del merged['key_0']
 
         # Estandarizar marcas - manejar valores no string
         if 'Marca' in merged.columns:
-            merged['marca_final'] = merged['Marca'].astype(str).str.strip().str.upper()
+            merged['marca_final'] = self._normalize_labels(merged['Marca'])
         else:
             print("Columna 'Marca' no encontrada en los datos fusionados")
 
@@ -208,24 +786,86 @@ class PricingAnalyzer:
         if all(col in merged.columns for col in ['Tu precio', 'Diferencia de precios']):
             merged['precio_ajustado'] = merged['Tu precio'] * (1 + merged['Diferencia de precios'])
 
-        self.enriched_data = merged
-        print(f"Datos enriquecidos: {len(merged)} productos con match")
+        return self._apply_schema(merged), matched
 
-        # Reportar calidad de datos
-        unmatched = 0
-        if 'product_id_feed' in merged.columns:
-            unmatched = len(merged[merged['product_id_feed'].isna()])
-        elif 'title_feed' in merged.columns:
-            unmatched = len(merged[merged['title_feed'].isna()])
-        elif 'Título' in merged.columns:
-            unmatched = len(merged[merged['Título'].isna()])
-        else:
-            print("No se encontraron columnas de referencia del feed para contar unmatched")
+    def _index_feed(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Indexa el feed por su ID normalizado para que el enriquecimiento sea una
+        búsqueda en el índice. Se construye una sola vez al parsear el feed
+        """
+        if df.index.name == FEED_ID_INDEX or len(df.columns) == 0:
+            return df
 
-        total = len(self.competitiveness_data)
-        print(f"Productos sin match en feed: {unmatched}/{total} ({unmatched/total*100:.1f}%)")
+        feed_id_col = self._detect_id_column(df)
+        df.index = pd.Index(self._normalize_ids(df[feed_id_col]), name=FEED_ID_INDEX)
+        return df
 
-        return merged
+    def _join_columns(self, left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        """
+        Une por columnas dos DataFrames alineados fila a fila, añadiendo los
+        sufijos del merge ('_merchant', '_feed') a las columnas repetidas
+        """
+        overlap = left.columns.intersection(right.columns)
+        if len(overlap):
+            left = left.rename(columns={col: f'{col}_merchant' for col in overlap})
+            right = right.rename(columns={col: f'{col}_feed' for col in overlap})
+        return pd.concat([left, right], axis=1)
+
+    def _build_id_match_report(self, comp_ids: pd.Series, matched: np.ndarray, feed_ids: pd.Index) -> Dict:
+        """Resume los IDs del CSV sin match en el feed y los IDs repetidos en el feed"""
+        unmatched_ids = comp_ids[~matched]
+        duplicated_ids = [] if feed_ids.is_unique else feed_ids[feed_ids.duplicated()].unique().tolist()
+
+        return {
+            'productos_con_match': int(matched.sum()),
+            'productos_sin_match': len(unmatched_ids),
+            'ids_sin_match': unmatched_ids.tolist(),
+            'ids_duplicados_feed': duplicated_ids
+        }
+
+    def _apply_schema(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convierte las columnas presentes al tipo compacto declarado en
+        COLUMN_SCHEMA. Los recuentos solo pasan a entero si no tienen nulos,
+        decimales ni valores fuera de rango
+        """
+        for column, dtype in COLUMN_SCHEMA.items():
+            if column not in df.columns or df[column].dtype == dtype:
+                continue
+
+            values = df[column]
+            if dtype == 'int32':
+                limits = np.iinfo(np.int32)
+                if values.isna().any() or not (values % 1 == 0).all() or \
+                        (len(values) and (values.min() < limits.min or values.max() > limits.max)):
+                    continue
+
+            df[column] = values.astype(dtype)
+
+        return df
+
+    def _normalize_ids(self, ids: pd.Series) -> pd.Series:
+        """
+        Normaliza IDs de producto para compararlos entre datasets. Los IDs son
+        casi todos distintos, así que se usan los kernels de texto de Arrow
+        """
+        normalized = ids.astype(str).astype('string[pyarrow]').str.strip().str.upper()
+        return normalized.astype(object)
+
+    def _normalize_id(self, value) -> str:
+        """Normaliza un único ID igual que _normalize_ids"""
+        return str(value).strip().upper()
+
+    def _normalize_labels(self, values: pd.Series) -> pd.Series:
+        """
+        Equivale a astype(str).str.strip().str.upper(); en columnas categóricas
+        (como las marcas) normaliza cada categoría una sola vez
+        """
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            return values.astype(str).str.strip().str.upper()
+
+        labels = np.append(values.cat.categories.astype(str).str.strip().str.upper().to_numpy(dtype=object), 'NAN')
+        return pd.Series(labels[values.cat.codes.to_numpy()], index=values.index, name=values.name)
 
     def _detect_id_column(self, df: pd.DataFrame) -> str:
         """
@@ -291,6 +931,7 @@ class PricingAnalyzer:
         # Si no se encuentra nada, devolver None
         return None
 
+    @profiled('metricas', rows_in=lambda self: len(self.enriched_data))
     def calculate_metrics(self) -> Dict:
         """
         Calcula métricas clave de pricing
@@ -298,14 +939,15 @@ class PricingAnalyzer:
         if self.enriched_data is None:
             raise ValueError("Debes enriquecer los datos primero")
 
-        df = self.enriched_data.copy()
+        # Solo lectura: no se modifica ni se copia el dataset enriquecido
+        df = self.enriched_data
 
         # Métricas globales
         total_clicks = df['Clics'].sum()
         total_products = len(df)
 
         # Distribución por segmento de precio
-        segment_dist = df.groupby('segmento_precio')['Clics'].sum()
+        segment_dist = click_counts(df).groupby(df['segmento_precio'], observed=True).sum()
         segment_pct = (segment_dist / total_clicks * 100).round(1)
 
         # Métricas de precio
@@ -315,162 +957,20 @@ class PricingAnalyzer:
             'media_ponderada': (df['price_diff_pct'] * df['Clics']).sum() / total_clicks
         }
 
-        # Análisis por marca
-        brand_metrics = []
-        for brand in df['Marca'].unique():
-            brand_data = df[df['Marca'] == brand]
-            brand_clicks = brand_data['Clics'].sum()
-
-            if brand_clicks > 0:
-                brand_segment_dist = brand_data.groupby('segmento_precio')['Clics'].sum()
-                brand_segment_pct = (brand_segment_dist / brand_clicks * 100).round(1)
-
-                brand_metrics.append({
-                    'marca': brand,
-                    'clics_totales': brand_clicks,
-                    'productos': len(brand_data),
-                    'price_diff_media_simple': brand_data['price_diff_pct'].mean(),
-                    'price_diff_media_ponderada': (brand_data['price_diff_pct'] * brand_data['Clics']).sum() / brand_clicks,
-                    'segmentos': brand_segment_pct.to_dict()
-                })
-
-        # Convertir a DataFrame y ordenar - verificar que hay datos
-        if brand_metrics:
-            brand_df = pd.DataFrame(brand_metrics).sort_values('clics_totales', ascending=False)
-        else:
-            brand_df = pd.DataFrame(columns=['marca', 'clics_totales', 'productos', 'price_diff_media_simple', 'price_diff_media_ponderada', 'segmentos'])
-
-        # Análisis por categoría si existe
-        category_metrics = None
-        if 'category_inferred' in df.columns:
-            category_metrics = []
-            for category in df['category_inferred'].dropna().unique():
-                cat_data = df[df['category_inferred'] == category]
-                cat_clicks = cat_data['Clics'].sum()
-
-                if cat_clicks > 0:
-                    category_metrics.append({
-                        'categoria': category,
-                        'clics_totales': cat_clicks,
-                        'productos': len(cat_data),
-                        'price_diff_media_ponderada': (cat_data['price_diff_pct'] * cat_data['Clics']).sum() / cat_clicks
-                    })
-
-            category_df = pd.DataFrame(category_metrics).sort_values('clics_totales', ascending=False) if category_metrics else pd.DataFrame(columns=['categoria', 'clics_totales', 'productos', 'price_diff_media_ponderada'])
-        else:
-            category_df = None
-
-        # Análisis por medidas
-        medida_metrics = []
-        if 'medida_final' in df.columns:
-            for medida in df['medida_final'].dropna().unique():
-                if len(str(medida)) > 3:  # Ignorar medidas vacías o muy cortas
-                    medida_data = df[df['medida_final'] == medida]
-                    medida_clicks = medida_data['Clics'].sum()
-
-                    if medida_clicks > 50:  # Solo medidas con clics significativos
-                        medida_metrics.append({
-                            'medida': medida,
-                            'clics_totales': medida_clicks,
-                            'productos': len(medida_data),
-                            'price_diff_media_ponderada': (medida_data['price_diff_pct'] * medida_data['Clics']).sum() / medida_clicks
-                        })
-
-            medida_df = pd.DataFrame(medida_metrics).sort_values('clics_totales', ascending=False) if medida_metrics else pd.DataFrame(columns=['medida', 'clics_totales', 'productos', 'price_diff_media_ponderada'])
-        else:
-            medida_df = None
-
-        # Análisis por modelos
-        modelo_metrics = []
-        if 'modelo_limpio' in df.columns:
-            for modelo in df['modelo_limpio'].dropna().unique():
-                if len(str(modelo)) > 1:  # Ignorar modelos vacíos
-                    modelo_data = df[df['modelo_limpio'] == modelo]
-                    modelo_clicks = modelo_data['Clics'].sum()
-
-                    if modelo_clicks > 30:  # Solo modelos con clics significativos
-                        modelo_metrics.append({
-                            'modelo': modelo,
-                            'clics_totales': modelo_clicks,
-                            'productos': len(modelo_data),
-                            'price_diff_media_ponderada': (modelo_data['price_diff_pct'] * modelo_data['Clics']).sum() / modelo_clicks
-                        })
-
-            modelo_df = pd.DataFrame(modelo_metrics).sort_values('clics_totales', ascending=False) if modelo_metrics else pd.DataFrame(columns=['modelo', 'clics_totales', 'productos', 'price_diff_media_ponderada'])
-        else:
-            modelo_df = None
-
-        # Análisis por temporadas
-        temporada_metrics = []
-        if 'temporada_limpia' in df.columns:
-            for temporada in df['temporada_limpia'].dropna().unique():
-                if len(str(temporada)) > 2:  # Ignorar temporadas vacías
-                    temporada_data = df[df['temporada_limpia'] == temporada]
-                    temporada_clicks = temporada_data['Clics'].sum()
-
-                    if temporada_clicks > 0:
-                        temporada_metrics.append({
-                            'temporada': temporada,
-                            'clics_totales': temporada_clicks,
-                            'productos': len(temporada_data),
-                            'price_diff_media_ponderada': (temporada_data['price_diff_pct'] * temporada_data['Clics']).sum() / temporada_clicks
-                        })
-
-            temporada_df = pd.DataFrame(temporada_metrics).sort_values('clics_totales', ascending=False) if temporada_metrics else pd.DataFrame(columns=['temporada', 'clics_totales', 'productos', 'price_diff_media_ponderada'])
-        else:
-            temporada_df = None
-
-        # Análisis por vehículo
-        vehiculo_metrics = []
-        if 'vehiculo_final' in df.columns:
-            for vehiculo in df['vehiculo_final'].dropna().unique():
-                if len(str(vehiculo)) > 2:  # Ignorar vehículos vacíos
-                    vehiculo_data = df[df['vehiculo_final'] == vehiculo]
-                    vehiculo_clicks = vehiculo_data['Clics'].sum()
-
-                    if vehiculo_clicks > 0:
-                        vehiculo_metrics.append({
-                            'vehiculo': vehiculo,
-                            'clics_totales': vehiculo_clicks,
-                            'productos': len(vehiculo_data),
-                            'price_diff_media_ponderada': (vehiculo_data['price_diff_pct'] * vehiculo_data['Clics']).sum() / vehiculo_clicks
-                        })
-
-            vehiculo_df = pd.DataFrame(vehiculo_metrics).sort_values('clics_totales', ascending=False) if vehiculo_metrics else pd.DataFrame(columns=['vehiculo', 'clics_totales', 'productos', 'price_diff_media_ponderada'])
-        else:
-            vehiculo_df = None
-
-        # Análisis por segmento de calidad
-        quality_metrics = []
-        if 'segmento_quality' in df.columns:
-            for quality in df['segmento_quality'].dropna().unique():
-                if len(str(quality)) > 1:  # Ignorar segmentos vacíos
-                    quality_data = df[df['segmento_quality'] == quality]
-                    quality_clicks = quality_data['Clics'].sum()
-
-                    if quality_clicks > 0:
-                        quality_metrics.append({
-                            'quality': quality,
-                            'clics_totales': quality_clicks,
-                            'productos': len(quality_data),
-                            'price_diff_media_ponderada': (quality_data['price_diff_pct'] * quality_data['Clics']).sum() / quality_clicks
-                        })
-
-            quality_df = pd.DataFrame(quality_metrics).sort_values('clics_totales', ascending=False) if quality_metrics else pd.DataFrame(columns=['quality', 'clics_totales', 'productos', 'price_diff_media_ponderada'])
-        else:
-            quality_df = None
+        # Desgloses por dimensión (marca, categoría, medida, modelo...)
+        breakdowns = {spec['key']: self._aggregate_dimension(df, spec) for spec in DIMENSION_BREAKDOWNS}
 
         # Top productos
-        top_products = df.nlargest(50, 'Clics')
+        top_products = top_rows(df, TOP_PRODUCTS, 'Clics')
 
         # Productos de riesgo (caros con muchos clics)
-        clicks_threshold = df['Clics'].quantile(0.75)
+        clicks_threshold = df['Clics'].quantile(RISK_CLICKS_QUANTILE)
         risk_products = df[(df['price_diff_pct'] > 0) & (df['Clics'] > clicks_threshold)]
-        risk_products = risk_products.nlargest(20, ['price_diff_pct', 'Clics'])
+        risk_products = top_rows(risk_products, RISK_PRODUCTS, RISK_RANKING)
 
         # Oportunidades (baratos con muchos clics)
         opportunity_products = df[(df['price_diff_pct'] < 0) & (df['Clics'] > clicks_threshold)]
-        opportunity_products = opportunity_products.nlargest(20, ['Clics', 'price_diff_pct'])
+        opportunity_products = top_rows(opportunity_products, OPPORTUNITY_PRODUCTS, OPPORTUNITY_RANKING)
 
         # Calidad de datos - manejar diferentes nombres de columnas de ID
         id_column = self._detect_merge_id_column(df)
@@ -496,7 +996,8 @@ class PricingAnalyzer:
 
         data_quality = {
             'total_productos_csv': len(self.competitiveness_data),
-            'total_productos_feed': len(self.feed_data),
+            'total_productos_feed': self.feed_data.attrs.get('feed_total_items', len(self.feed_data)),
+            'productos_feed_descartados': self.feed_data.attrs.get('feed_skipped_items', 0),
             'productos_con_match': productos_con_match,
             'productos_sin_match': productos_sin_match,
             'porcentaje_match': porcentaje_match,
@@ -511,41 +1012,127 @@ class PricingAnalyzer:
                 'segmento_distribucion': segment_pct.to_dict(),
                 'price_diff_stats': price_diff_stats
             },
-            'marcas': brand_df,
-            'categorias': category_df,
-            'medidas': medida_df,
-            'modelos': modelo_df,
-            'temporadas': temporada_df,
-            'vehiculos': vehiculo_df,
-            'quality_segments': quality_df,
+            **breakdowns,
             'top_productos': top_products,
             'productos_riesgo': risk_products,
             'oportunidades': opportunity_products,
             'calidad_datos': data_quality
         }
 
-    def _get_price_segment(self, diff_pct: float) -> str:
-        """Clasifica el producto según su diferencia de precio"""
-        if diff_pct <= -5:
-            return 'MUCHO_MAS_BARATO'
-        elif diff_pct <= -1:
-            return 'BARATO'
-        elif diff_pct < 1:
-            return 'ALINEADO'
-        elif diff_pct < 5:
-            return 'CARO'
+    def iter_enriched_chunks(self, csv_content, chunk_size: int = CSV_CHUNK_SIZE,
+                             feed_columns: Optional[Tuple[str, ...]] = DOWNSTREAM_FEED_COLUMNS) -> Iterator[pd.DataFrame]:
+        """
+        Lee el CSV de competitividad en bloques de chunk_size filas y devuelve
+        cada bloque ya enriquecido con el feed cargado, sin guardar el CSV ni
+        el resultado completos en memoria
+        """
+        if self.feed_data is None:
+            raise ValueError("Debes cargar el feed antes de enriquecer por bloques")
+
+        feed_data = self._index_feed(self.feed_data)
+        feed_id_col = self._detect_id_column(feed_data)
+        comp_id_col = None
+
+        stream = self._open_competitiveness_csv(csv_content)
+        with pd.read_csv(stream, encoding='utf-8', chunksize=chunk_size) as reader:
+            for chunk in reader:
+                chunk = self._prepare_competitiveness(chunk)
+                if comp_id_col is None:
+                    comp_id_col = self._detect_id_column(chunk)
+                merged, _ = self._enrich_frame(chunk, comp_id_col, feed_data, feed_id_col, feed_columns)
+                yield merged
+
+    def calculate_metrics_chunked(self, chunks: Iterable[pd.DataFrame]) -> Dict:
+        """
+        Calcula las mismas métricas que calculate_metrics combinando agregados
+        parciales de cada bloque de filas enriquecidas (p. ej. los de
+        iter_enriched_chunks), para datasets que no caben en memoria. Las
+        tolerancias frente al cálculo en memoria están en partial_metrics
+        """
+        partial = PartialMetrics(DIMENSION_BREAKDOWNS)
+        match_column = None
+        for chunk in chunks:
+            if match_column is None:
+                match_column = self._detect_merge_id_column(chunk) or ''
+            partial.update(chunk, match_column)
+
+        feed_attrs = self.feed_data.attrs if self.feed_data is not None else {}
+        return partial.finalize(
+            total_productos_feed=feed_attrs.get('feed_total_items', 0 if self.feed_data is None else len(self.feed_data)),
+            productos_feed_descartados=feed_attrs.get('feed_skipped_items', 0)
+        )
+
+    def run_pipeline(self, csv_content, xml_content, pushdown: bool = False,
+                     feed_columns: Optional[Tuple[str, ...]] = DOWNSTREAM_FEED_COLUMNS,
+                     workers: int = 1) -> Dict:
+        """
+        Ejecuta el análisis completo: ingesta del CSV y del feed, enriquecimiento
+        y métricas. Devuelve las métricas y deja en stage_timings el tiempo real
+        (segundos) de cada etapa
+
+        Por defecto el CSV y el feed se parsean a la vez en dos hilos (el parseo
+        de lxml y el lector CSV de pandas liberan el GIL en parte); 'ingesta' es
+        el tiempo conjunto, frente a la suma de 'csv' y 'feed'. Con pushdown=True
+        se parsea primero el CSV para filtrar el feed por sus IDs, y las dos
+        lecturas van en secuencia
+        """
+        self.stage_timings = {}
+        start = time.perf_counter()
+
+        if pushdown:
+            self._timed('csv', self.parse_competitiveness_csv, csv_content)
+            self._timed('feed', self.parse_product_feed_xml, xml_content,
+                        id_filter=self.competitiveness_id_set(), columns=feed_columns, workers=workers)
         else:
-            return 'MUCHO_MAS_CARO'
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                csv_future = pool.submit(self._timed, 'csv', self.parse_competitiveness_csv, csv_content)
+                feed_future = pool.submit(self._timed, 'feed', self.parse_product_feed_xml, xml_content,
+                                          columns=feed_columns, workers=workers)
+                csv_future.result()
+                feed_future.result()
+        self.stage_timings['ingesta'] = time.perf_counter() - start
+
+        self._timed('enriquecimiento', self.enrich_data, feed_columns)
+        metrics = self._timed('metricas', self.calculate_metrics)
+        self.stage_timings['total'] = time.perf_counter() - start
+
+        print("Tiempos del pipeline: " + ", ".join(
+            f"{stage} {seconds:.2f}s" for stage, seconds in self.stage_timings.items()
+        ))
+        return metrics
+
+    def _timed(self, stage: str, func, *args, **kwargs):
+        """Ejecuta func y guarda su tiempo real en stage_timings[stage]"""
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.stage_timings[stage] = time.perf_counter() - start
+
+    def _aggregate_dimension(self, df: pd.DataFrame, spec: Dict) -> Optional[pd.DataFrame]:
+        """
+        Agrega clics, productos y diferencias de precio por los valores de una
+        dimensión en una sola pasada de groupby, según la configuración de
+        DIMENSION_BREAKDOWNS
+        """
+        return finalize_dimension(spec, dimension_partial(df, spec))
 
-    def _get_xml_text(self, element, tag: str) -> str:
-        """Extrae texto de un elemento XML de forma segura"""
-        found = element.find(f'.//{tag}')
-        return found.text if found is not None else ''
+    def _segment_prices(self, diff_pct: pd.Series,
+                        thresholds: Tuple[float, ...] = PRICE_SEGMENT_THRESHOLDS) -> pd.Categorical:
+        """
+        Clasifica los productos según su diferencia de precio:
+        <= -5 muy barato, <= -1 barato, < 1 alineado, < 5 caro y el resto muy caro.
+        Los valores sin diferencia (NaN) quedan en MUCHO_MAS_CARO, como en la
+        clasificación fila a fila original. Para re-segmentar con otros
+        umbrales sin reprocesar, ver segmentation_index
+        """
+        low, cheap, aligned, expensive = thresholds
+        values = diff_pct.to_numpy(dtype='float64', na_value=np.nan)
 
-    def _get_xml_text_with_ns(self, element, tag: str, ns: dict) -> str:
-        """Extrae texto de un elemento XML con namespace de forma segura"""
-        found = element.find(f'.//{tag}', ns)
-        return found.text if found is not None else ''
+        codes = ((values > low).astype(np.int8) + (values > cheap) + (values >= aligned) + (values >= expensive))
+        codes[np.isnan(values)] = len(PRICE_SEGMENTS) - 1
+
+        return pd.Categorical.from_codes(codes, categories=PRICE_SEGMENTS, ordered=True)
 
     def _extract_price(self, price_str: str) -> float:
         """Extrae valor numérico de un string de precio"""
@@ -562,46 +1149,85 @@ class PricingAnalyzer:
         match = re.search(r'[A-Z]{3}', price_str.upper())
         return match.group() if match else None
 
-    def _infer_category_from_title(self, title: str) -> str:
-        """Infiere categoría del título del producto"""
-        title_lower = title.lower()
-
-        if any(word in title_lower for word in ['turismo', 'touring', 'passenger']):
-            return 'turismo'
-        elif any(word in title_lower for word in ['4x4', 'suv', '4x2', 'off-road', 'all terrain']):
-            return '4x4'
-        elif any(word in title_lower for word in ['furgoneta', 'van', 'camion', 'cargo']):
-            return 'furgoneta'
-        elif any(word in title_lower for word in ['moto', 'motorcycle']):
-            return 'moto'
-        else:
-            return 'otro'
-
-    def _infer_vehicle_type(self, title: str) -> str:
-        """Infiere tipo de vehículo del título"""
-        title_lower = title.lower()
-
-        if 'coche' in title_lower or 'turismo' in title_lower:
-            return 'coche'
-        elif any(word in title_lower for word in ['suv', '4x4']):
-            return 'suv'
-        elif 'furgoneta' in title_lower:
-            return 'furgoneta'
+@contextmanager
+def _feed_file(content) -> Iterator[Tuple[str, int]]:
+    """
+    Ruta de un fichero con el feed y offset en el que empieza: el propio
+    fichero si content es un fichero en disco o, si no, uno temporal en el que
+    se vuelca por bloques (sin otra copia completa en memoria)
+    """
+    path = _disk_path(content)
+    if path is not None:
+        yield path, content.tell()
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.xml', delete=False) as tmp:
+        if hasattr(content, 'read'):
+            shutil.copyfileobj(content, tmp, FEED_COPY_BLOCK_BYTES)
+        elif isinstance(content, str):
+            for start in range(0, len(content), FEED_COPY_BLOCK_BYTES):
+                tmp.write(content[start:start + FEED_COPY_BLOCK_BYTES].encode('utf-8'))
         else:
-            return 'desconocido'
-
-    def _infer_season(self, title: str) -> str:
-        """Infiere temporada del neumático del título"""
-        title_lower = title.lower()
-
-        if 'invierno' in title_lower or 'winter' in title_lower:
-            return 'invierno'
-        elif 'verano' in title_lower or 'summer' in title_lower:
-            return 'verano'
-        elif any(word in title_lower for word in ['all season', '4 estaciones']):
-            return 'all_season'
-        else:
-            return 'desconocida'
+            tmp.write(content)
+    try:
+        yield tmp.name, 0
+    finally:
+        os.remove(tmp.name)
+
+def _disk_path(content) -> Optional[str]:
+    """Ruta de content si es un fichero binario abierto en disco"""
+    try:
+        content.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+    name = getattr(content, 'name', None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+class _FeedRangeStream(io.RawIOBase):
+    """Flujo de lectura sobre varios buffers seguidos (cabecera, rango del feed mapeado y cierre)"""
+
+    def __init__(self, parts):
+        self._parts = [memoryview(part) for part in parts]
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._parts and not len(self._parts[0]):
+            self._parts.pop(0)
+        if not self._parts:
+            return 0
+        part = self._parts[0]
+        n = min(len(buffer), len(part))
+        buffer[:n] = part[:n]
+        self._parts[0] = part[n:]
+        return n
+
+# Opciones del parseo paralelo en cada proceso del pool, fijadas al arrancarlo
+# para no enviar el filtro de IDs con cada rango. El feed se mapea una vez por
+# proceso y cada tarea solo recibe los offsets de su rango
+_feed_worker_options = {}
+
+def _init_feed_worker(path: str, prefix: bytes, suffix: bytes, chunk_size: int,
+                      id_filter: Optional[set], fields: Optional[set]) -> None:
+    with open(path, 'rb') as source:
+        data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    _feed_worker_options.update(data=data, prefix=prefix, suffix=suffix, chunk_size=chunk_size,
+                                id_filter=id_filter, fields=fields)
+
+def _parse_feed_range(bounds: Tuple[int, int]) -> Tuple[pd.DataFrame, int, int]:
+    """Parsea un rango del feed en un proceso del pool: (items, leídos, descartados)"""
+    start, end = bounds
+    document = _FeedRangeStream([_feed_worker_options['prefix'], memoryview(_feed_worker_options['data'])[start:end],
+                                 _feed_worker_options['suffix']])
+    analyzer = PricingAnalyzer()
+    try:
+        df = analyzer._parse_feed_stream(document, _feed_worker_options['chunk_size'],
+                                         _feed_worker_options['id_filter'], _feed_worker_options['fields'])
+    except etree.XMLSyntaxError as e:
+        # Los errores de lxml no se pueden enviar de vuelta al proceso principal
+        raise ValueError(f"rango del feed no válido: {e}") from None
+    return df, analyzer.feed_items_read, analyzer.feed_items_skipped
 
 if __name__ == "__main__":
     analyzer = PricingAnalyzer()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Datos de productos embebidos en el informe HTML
+Serializa los datos enriquecidos como JSON columnar (las columnas de texto con
+pocos valores distintos se codifican como diccionario + códigos), lo comprime
+con gzip y lo codifica en base64 para incrustarlo en el HTML. El navegador lo
+descomprime con DecompressionStream y lo muestra en una tabla paginada
+"""
+
+import base64
+import gzip
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Columnas de la tabla de productos del informe, en orden
+PAYLOAD_COLUMNS = [
+    'ID de producto', 'Título', 'Marca', 'category_inferred', 'medida_final', 'temporada_limpia',
+    'vehiculo_final', 'Tu precio', 'Referencia', 'price_diff_pct', 'segmento_precio', 'Clics', 'link'
+]
+
+# Decimales de las columnas numéricas no enteras
+PAYLOAD_DECIMALS = 2
+
+# Una columna de texto se codifica como diccionario si sus valores distintos
+# no superan esta fracción de las filas
+DICTIONARY_MAX_RATIO = 0.5
+
+# Nivel de gzip: a partir de 6 el tiempo crece mucho más que la reducción de tamaño
+PAYLOAD_COMPRESSLEVEL = 5
+
+def encode_products(df: pd.DataFrame, columns: Sequence[str] = PAYLOAD_COLUMNS) -> str:
+    """Datos de los productos como JSON columnar comprimido con gzip, en base64"""
+    payload = {
+        'n': len(df),
+        'columnas': [_encode_column(name, df[name]) for name in columns if name in df.columns]
+    }
+    raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+    return base64.b64encode(gzip.compress(raw, compresslevel=PAYLOAD_COMPRESSLEVEL)).decode('ascii')
+
+def decode_products(encoded: str) -> pd.DataFrame:
+    """Operación inversa de encode_products (los nulos vuelven como None/NaN)"""
+    payload = json.loads(gzip.decompress(base64.b64decode(encoded)))
+    data = {}
+    for col in payload['columnas']:
+        if 'categorias' in col:
+            categories = np.array(col['categorias'] + [None], dtype=object)
+            data[col['nombre']] = categories[np.asarray(col['codigos'], dtype='int64')]
+        else:
+            data[col['nombre']] = col['valores']
+    return pd.DataFrame(data, index=pd.RangeIndex(payload['n']))
+
+def _encode_column(name: str, values: pd.Series) -> Dict:
+    """Una columna del payload: valores en lista o diccionario + códigos (-1 es nulo)"""
+    if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+        codes, categories = pd.factorize(values)
+        if len(categories) <= DICTIONARY_MAX_RATIO * len(values):
+            return {'nombre': name, 'categorias': [str(value) for value in categories], 'codigos': codes.tolist()}
+        return {'nombre': name, 'valores': [value if value is None else str(value) for value in _nullable(values)]}
+
+    if pd.api.types.is_integer_dtype(values) and not values.hasnans:
+        return {'nombre': name, 'valores': values.astype('int64').tolist()}
+    if pd.api.types.is_integer_dtype(values):
+        return {'nombre': name, 'valores': _nullable(values)}
+    return {'nombre': name, 'valores': _nullable(values.astype('float64').round(PAYLOAD_DECIMALS))}
+
+def _nullable(values: pd.Series) -> List[Optional[object]]:
+    """Lista de valores con los nulos como None (null en JSON)"""
+    return values.astype(object).where(values.notna(), None).tolist()
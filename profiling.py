@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Instrumentación de las etapas del análisis
+Mide en cada etapa el tiempo real, el tiempo de CPU, las filas de entrada y de
+salida y el pico de memoria trazada, lo emite como registro de log
+estructurado y lo acumula en un RunProfile para mostrarlo en el panel
+"""
+
+import functools
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger('pricing_analyzer.profiling')
+
+# Estado compartido del trazado de memoria entre etapas (y entre hilos)
+_trace_lock = threading.Lock()
+_active_traced_stages = 0
+_started_tracing = False
+
+class StageProfile:
+    """Medidas de una ejecución de una etapa"""
+
+    def __init__(self, stage: str, wall_s: float, cpu_s: float, rows_in: Optional[int] = None,
+                 rows_out: Optional[int] = None, peak_mb: Optional[float] = None):
+        self.stage = stage
+        self.wall_s = wall_s
+        self.cpu_s = cpu_s
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+        self.peak_mb = peak_mb
+
+    def to_dict(self) -> Dict:
+        return {
+            'etapa': self.stage,
+            'tiempo_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'filas_entrada': self.rows_in,
+            'filas_salida': self.rows_out,
+            'pico_memoria_mb': self.peak_mb
+        }
+
+class RunProfile:
+    """
+    Resumen de las etapas de un análisis. Con trace_memory=True se activa
+    tracemalloc durante cada etapa para medir su pico de memoria (sobre la
+    memoria que ya había al empezar); el trazado ralentiza el código Python,
+    así que por defecto solo se miden tiempos y filas
+
+    El tiempo de CPU es el del proceso: en etapas que se ejecutan a la vez en
+    varios hilos (ingesta de run_pipeline) se solapa, y también el pico de
+    memoria, que pasa a ser el conjunto. No incluye procesos hijos (parseo
+    paralelo del feed)
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: List[StageProfile] = []
+
+    def record(self, profile: StageProfile) -> None:
+        """Añade una etapa y la emite como registro de log estructurado"""
+        self.stages.append(profile)
+        fields = profile.to_dict()
+        peak = f", pico {profile.peak_mb:.1f} MB" if profile.peak_mb is not None else ""
+        logger.info(
+            f"Etapa {profile.stage}: {profile.wall_s:.3f}s, CPU {profile.cpu_s:.3f}s, "
+            f"filas {profile.rows_in} -> {profile.rows_out}{peak}",
+            extra={'perfil_etapa': fields}
+        )
+
+    def extend(self, other: 'RunProfile') -> 'RunProfile':
+        """Incorpora las etapas de otro perfil (p. ej. de etapas cacheadas por separado)"""
+        self.stages.extend(other.stages)
+        return self
+
+    @property
+    def total_wall_s(self) -> float:
+        return sum(stage.wall_s for stage in self.stages)
+
+    def summary(self) -> pd.DataFrame:
+        """Una fila por etapa con sus medidas"""
+        columns = list(StageProfile('', 0.0, 0.0).to_dict())
+        return pd.DataFrame([stage.to_dict() for stage in self.stages], columns=columns)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Mide el bloque como la etapa name. Devuelve un diccionario en el que
+        el bloque puede dejar 'rows_in' y 'rows_out'
+        """
+        counts = {'rows_in': None, 'rows_out': None}
+        baseline = self._start_tracing() if self.trace_memory else None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield counts
+        finally:
+            wall_s = time.perf_counter() - wall_start
+            cpu_s = time.process_time() - cpu_start
+            peak_mb = self._stop_tracing(baseline) if self.trace_memory else None
+            self.record(StageProfile(name, wall_s, cpu_s, counts['rows_in'], counts['rows_out'], peak_mb))
+
+    def _start_tracing(self) -> int:
+        """Activa tracemalloc si hace falta y devuelve la memoria trazada actual"""
+        global _active_traced_stages, _started_tracing
+        with _trace_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+            if _active_traced_stages == 0:
+                tracemalloc.reset_peak()
+            _active_traced_stages += 1
+            return tracemalloc.get_traced_memory()[0]
+
+    def _stop_tracing(self, baseline: int) -> float:
+        """Pico de memoria (MB) desde baseline; desactiva tracemalloc si lo activamos aquí"""
+        global _active_traced_stages, _started_tracing
+        with _trace_lock:
+            peak = tracemalloc.get_traced_memory()[1]
+            _active_traced_stages -= 1
+            if _active_traced_stages == 0 and _started_tracing:
+                tracemalloc.stop()
+                _started_tracing = False
+        return max(peak - baseline, 0) / 1024 ** 2
+
+def profiled(stage: str, rows_in: Optional[Callable] = None):
+    """
+    Decorador para métodos de clases con atributo profile (RunProfile o
+    None): mide la llamada como la etapa stage. rows_in(self, *args, **kwargs)
+    da las filas de entrada y se evalúa tras la llamada; las de salida son
+    len() del resultado si es un DataFrame
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profile = getattr(self, 'profile', None)
+            if profile is None:
+                return method(self, *args, **kwargs)
+
+            with profile.stage(stage) as counts:
+                result = method(self, *args, **kwargs)
+                if rows_in is not None:
+                    counts['rows_in'] = rows_in(self, *args, **kwargs)
+                if isinstance(result, pd.DataFrame):
+                    counts['rows_out'] = len(result)
+            return result
+        return wrapper
+    return decorator
@@ -6,20 +6,184 @@ Generador de informes HTML para análisis de competitividad de precios
 import pandas as pd
 import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import base64
 
+from profiling import RunProfile, profiled
+from partial_metrics import TOP_PRODUCTS, top_rows
+from pricing_analyzer import PRICE_SEGMENTS
+from html_tables import column, number, price_class, rows, td, text
+from product_payload import encode_products
+from chart_data import price_click_density
+
+# Filas máximas de cada tabla del informe (None: todas). 'todos' es la tabla
+# de productos embebidos (embed_products): con un límite solo se incrustan los
+# de más clics
+DEFAULT_TABLE_LIMITS = {
+    'marcas': 20,
+    'productos': TOP_PRODUCTS,
+    'medidas': 20,
+    'modelos': 15,
+    'riesgo': 10,
+    'oportunidades': 10,
+    'todos': None
+}
+
+SEGMENT_CSS_CLASSES = {
+    'MUCHO_MAS_BARATO': 'segment-muy-barato',
+    'BARATO': 'segment-barato',
+    'ALINEADO': 'segment-alineado',
+    'CARO': 'segment-caro',
+    'MUCHO_MAS_CARO': 'segment-muy-caro'
+}
+
+SEGMENT_BADGE_COLORS = {
+    'MUCHO_MAS_BARATO': 'success',
+    'BARATO': 'success',
+    'ALINEADO': 'secondary',
+    'CARO': 'warning',
+    'MUCHO_MAS_CARO': 'danger'
+}
+
+# Tabla con todos los productos (modo embed_products): descomprime los datos
+# embebidos y los muestra con DataTables, que solo crea las filas de la página
+# visible (deferRender). Sin formato Python: las llaves son de JavaScript
+ALL_PRODUCTS_SCRIPT = """
+    <script>
+        const PRODUCT_COLUMNS = [
+            {name: 'ID de producto', render: textCell},
+            {name: 'Título', render: titleCell},
+            {name: 'Marca', render: textCell},
+            {name: 'category_inferred', render: textCell},
+            {name: 'medida_final', render: textCell},
+            {name: 'temporada_limpia', render: textCell},
+            {name: 'vehiculo_final', render: textCell},
+            {name: 'Tu precio', render: euroCell, type: 'num'},
+            {name: 'Referencia', render: euroCell, type: 'num'},
+            {name: 'price_diff_pct', render: diffCell, type: 'num'},
+            {name: 'segmento_precio', render: segmentCell},
+            {name: 'Clics', render: clicksCell, type: 'num'},
+            {name: 'link', render: linkCell, orderable: false, searchable: false}
+        ];
+        const SEGMENT_COLORS = {
+            MUCHO_MAS_BARATO: 'success', BARATO: 'success', ALINEADO: 'secondary',
+            CARO: 'warning', MUCHO_MAS_CARO: 'danger'
+        };
+
+        function escapeHtml(value) {
+            const entities = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'};
+            return String(value).replace(/[&<>"']/g, ch => entities[ch]);
+        }
+
+        // En 'display' se formatea la celda; para ordenar y filtrar se usa el valor
+        function display(format) {
+            return (value, type) => type !== 'display' ? (value ?? '') : (value === null ? 'N/A' : format(value));
+        }
+        function textCell(value, type) { return display(escapeHtml)(value, type); }
+        function titleCell(value, type) {
+            return display(title => `<span title="${escapeHtml(title)}">` +
+                escapeHtml(title.length > 60 ? title.slice(0, 60) + '...' : title) + '</span>')(value, type);
+        }
+        function euroCell(value, type) { return display(price => price.toFixed(2) + '€')(value, type); }
+        function diffCell(value, type) {
+            return display(diff => {
+                const css = diff < -1 ? 'positive' : diff > 1 ? 'negative' : 'neutral';
+                return `<span class="price-${css}">${diff >= 0 ? '+' : ''}${diff.toFixed(2)}%</span>`;
+            })(value, type);
+        }
+        function segmentCell(value, type) {
+            return display(segment => `<span class="badge bg-${SEGMENT_COLORS[segment] || 'secondary'}">` +
+                escapeHtml(segment) + '</span>')(value, type);
+        }
+        function clicksCell(value, type) { return display(clicks => clicks.toLocaleString('en-US'))(value, type); }
+        function linkCell(value, type) {
+            return display(link => `<a href="${escapeHtml(link)}" target="_blank" class="btn btn-sm btn-outline-primary">` +
+                '<i class="fas fa-external-link-alt"></i></a>')(value, type);
+        }
+
+        // base64 -> gzip -> JSON columnar ({n, columnas}); las columnas
+        // codificadas como diccionario se expanden (código -1 es nulo)
+        async function decodeProducts(elementId) {
+            const binary = atob(document.getElementById(elementId).textContent.trim());
+            const bytes = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i);
+            }
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            const payload = await new Response(stream).json();
+
+            const columns = {};
+            payload.columnas.forEach(col => {
+                columns[col.nombre] = col.categorias
+                    ? col.codigos.map(code => code < 0 ? null : col.categorias[code])
+                    : col.valores;
+            });
+
+            const sources = PRODUCT_COLUMNS.map(col => columns[col.name] || null);
+            const rows = new Array(payload.n);
+            for (let i = 0; i < payload.n; i++) {
+                rows[i] = sources.map(values => values ? values[i] : null);
+            }
+            return rows;
+        }
+
+        $(document).ready(async function() {
+            const status = $('#allProductsStatus');
+            let rows;
+            try {
+                rows = await decodeProducts('productData');
+            } catch (error) {
+                status.text('No se pudieron cargar los productos: el navegador no permite descomprimir los datos embebidos');
+                return;
+            }
+
+            const table = $('#allProductsTable').DataTable({
+                data: rows,
+                deferRender: true,
+                pageLength: 25,
+                searchDelay: 300,
+                order: [[11, 'desc']],
+                columns: PRODUCT_COLUMNS.map(col => ({
+                    render: col.render,
+                    type: col.type,
+                    orderable: col.orderable !== false,
+                    searchable: col.searchable !== false
+                })),
+                language: {
+                    url: '//cdn.datatables.net/plug-ins/1.13.6/i18n/es.json'
+                }
+            });
+            status.remove();
+
+            $('#allProductsSegment').on('change', function() {
+                const segment = $(this).val();
+                table.column(10).search(segment ? '^' + segment + '$' : '', true, false).draw();
+            });
+        });
+    </script>
+"""
+
 class ReportGenerator:
-    def __init__(self):
+    def __init__(self, profile: Optional[RunProfile] = None, table_limits: Optional[Dict[str, Optional[int]]] = None,
+                 embed_products: bool = False):
         self.report_date = datetime.now().strftime("%Y-%m-%d")
-
+        # Medidas de la generación del informe (ver profiling); sin profile no se mide
+        self.profile = profile
+        # Filas por tabla; las claves que no se indiquen usan DEFAULT_TABLE_LIMITS
+        self.table_limits = {**DEFAULT_TABLE_LIMITS, **(table_limits or {})}
+        # Incrustar todos los productos comprimidos con una tabla paginada en el navegador
+        self.embed_products = embed_products
+
+    @profiled('informe', rows_in=lambda self, metrics, date_range, enriched_data: len(enriched_data))
     def generate_html_report(self, metrics: Dict, date_range: str, enriched_data: pd.DataFrame) -> str:
         """
         Genera el informe HTML completo con todos los análisis
         """
 
         # Preparar datos para gráficos
-        charts_data = self._prepare_charts_data(metrics)
+        charts_data = self._prepare_charts_data(metrics, enriched_data)
+        top_products = self._top_products(metrics, enriched_data)
+        n_top_products = len(top_products) if top_products is not None else 0
 
         html_content = f"""
 <!DOCTYPE html>
@@ -214,7 +378,7 @@ class ReportGenerator:
             </div>
             <div class="col-md-6">
                 <div class="chart-container">
-                    <h5 class="section-title">Dispersión Precio vs Clics</h5>
+                    <h5 class="section-title">Densidad Precio vs Clics</h5>
                     <canvas id="scatterChart"></canvas>
                 </div>
             </div>
@@ -261,7 +425,7 @@ class ReportGenerator:
 
         <!-- Top Productos -->
         <div class="table-container">
-            <h3 class="section-title"><i class="fas fa-trophy me-2"></i>Top 50 Productos por Clics</h3>
+            <h3 class="section-title"><i class="fas fa-trophy me-2"></i>Top {n_top_products} Productos por Clics</h3>
             <table id="topProductsTable" class="table table-striped table-sm">
                 <thead>
                     <tr>
@@ -281,11 +445,14 @@ class ReportGenerator:
                     </tr>
                 </thead>
                 <tbody>
-                    {self._generate_top_products_rows(metrics['top_productos'])}
+                    {self._generate_top_products_rows(top_products)}
                 </tbody>
             </table>
         </div>
 
+        <!-- Todos los Productos -->
+        {self._generate_all_products_section(enriched_data)}
+
         <!-- Productos de Riesgo -->
         {self._generate_risk_products_section(metrics['productos_riesgo'])}
 
@@ -382,18 +549,26 @@ class ReportGenerator:
             }}
         }});
 
-        // Gráfico de dispersión
+        // Gráfico de densidad: burbujas del histograma de todos los productos
+        // (área proporcional a sus clics) y productos atípicos como puntos
         const scatterCtx = document.getElementById('scatterChart').getContext('2d');
         new Chart(scatterCtx, {{
-            type: 'scatter',
+            type: 'bubble',
             data: {{
                 datasets: [{{
-                    label: 'Productos',
-                    data: chartsData.scatter.data,
-                    backgroundColor: 'rgba(102, 126, 234, 0.6)',
-                    borderColor: 'rgba(102, 126, 234, 1)',
-                    pointRadius: 5,
-                    pointHoverRadius: 7
+                    label: 'Productos (agrupados)',
+                    data: chartsData.scatter.bins,
+                    backgroundColor: 'rgba(102, 126, 234, 0.35)',
+                    borderColor: 'rgba(102, 126, 234, 0.8)',
+                    borderWidth: 1
+                }}, {{
+                    type: 'scatter',
+                    label: 'Productos atípicos',
+                    data: chartsData.scatter.outliers,
+                    backgroundColor: 'rgba(220, 53, 69, 0.7)',
+                    borderColor: 'rgba(220, 53, 69, 1)',
+                    pointRadius: 4,
+                    pointHoverRadius: 6
                 }}]
             }},
             options: {{
@@ -403,7 +578,11 @@ class ReportGenerator:
                         callbacks: {{
                             label: function(context) {{
                                 const point = context.raw;
-                                return `{{point.title}} - {{point.brand}}: {{point.x}}% diferencia, {{point.y}} clics`;
+                                if (point.title !== undefined) {{
+                                    return `${{point.title}} - ${{point.brand}}: ${{point.x}}% diferencia, ${{point.y}} clics`;
+                                }}
+                                return `${{point.productos}} productos, ${{point.clics}} clics: ` +
+                                    `${{point.diff_min}}% a ${{point.diff_max}}% diferencia, ${{point.clics_min}}-${{point.clics_max}} clics`;
                             }}
                         }}
                     }}
@@ -416,22 +595,23 @@ class ReportGenerator:
                         }}
                     }},
                     y: {{
+                        type: 'logarithmic',
                         title: {{
                             display: true,
                             text: 'Clics'
-                        }},
-                        beginAtZero: true
+                        }}
                     }}
                 }}
             }}
         }});
     </script>
+    {ALL_PRODUCTS_SCRIPT if self.embed_products else ''}
 </body>
 </html>
 """
         return html_content
 
-    def _prepare_charts_data(self, metrics: Dict) -> Dict:
+    def _prepare_charts_data(self, metrics: Dict, enriched_data: Optional[pd.DataFrame] = None) -> Dict:
         """Prepara datos para los gráficos Chart.js"""
 
         # Datos para gráfico de segmentos
@@ -445,17 +625,12 @@ class ReportGenerator:
                 segments_labels.append(self._format_segment_label(segment))
                 segments_data.append(segment_data[segment])
 
-        # Datos para scatter plot (primeros 100 productos para mejor rendimiento)
-        scatter_data = []
-        top_products = metrics['top_productos'].head(100)
-
-        for _, product in top_products.iterrows():
-            scatter_data.append({
-                'x': round(product['price_diff_pct'], 2),
-                'y': int(product['Clics']),
-                'title': product['Título'][:30] + '...' if len(product['Título']) > 30 else product['Título'],
-                'brand': product['Marca']
-            })
+        # Datos para el gráfico de densidad: todos los productos agrupados en
+        # celdas más los atípicos (tamaño fijo sea cual sea el número de filas)
+        products = enriched_data if enriched_data is not None and len(enriched_data) > 0 \
+            else metrics['top_productos']
+        density = price_click_density(products) if products is not None and len(products) > 0 \
+            else {'bins': [], 'outliers': []}
 
         return {
             'segments': {
@@ -463,7 +638,8 @@ class ReportGenerator:
                 'data': segments_data
             },
             'scatter': {
-                'data': scatter_data
+                'bins': density['bins'],
+                'outliers': density['outliers']
             }
         }
 
@@ -536,315 +712,225 @@ class ReportGenerator:
         }
         return labels.get(segment, segment)
 
+    def _limit_rows(self, df: pd.DataFrame, table: str) -> pd.DataFrame:
+        """Primeras filas de df según el límite de la tabla"""
+        limit = self.table_limits.get(table)
+        return df if limit is None else df.head(limit)
+
     def _generate_brands_table_rows(self, brands_df: pd.DataFrame) -> str:
         """Genera filas HTML para tabla de marcas"""
         if brands_df is None or len(brands_df) == 0:
             return '<tr><td colspan="10">No hay datos disponibles</td></tr>'
 
-        rows = []
-        for _, brand in brands_df.head(20).iterrows():  # Top 20 marcas
-            # Manejar valores nulos con defaults seguros
-            marca = brand.get('marca', 'N/A')
-            clics_totales = int(brand.get('clics_totales', 0) or 0)
-            productos = int(brand.get('productos', 0) or 0)
-            price_diff_simple = float(brand.get('price_diff_media_simple', 0) or 0)
-            price_diff_ponderada = float(brand.get('price_diff_media_ponderada', 0) or 0)
-
-            segments = brand.get('segmentos') if isinstance(brand.get('segmentos'), dict) else {}
-
-            row = f"""
-                <tr>
-                    <td><strong>{marca}</strong></td>
-                    <td>{clics_totales:,}</td>
-                    <td>{productos}</td>
-                    <td class="price-{self._get_price_class(price_diff_simple)}">
-                        {price_diff_simple:+.2f}%
-                    </td>
-                    <td class="price-{self._get_price_class(price_diff_ponderada)}">
-                        {price_diff_ponderada:+.2f}%
-                    </td>
-                    <td class="segment-muy-barato">{segments.get('MUCHO_MAS_BARATO', 0):.1f}%</td>
-                    <td class="segment-barato">{segments.get('BARATO', 0):.1f}%</td>
-                    <td class="segment-alineado">{segments.get('ALINEADO', 0):.1f}%</td>
-                    <td class="segment-caro">{segments.get('CARO', 0):.1f}%</td>
-                    <td class="segment-muy-caro">{segments.get('MUCHO_MAS_CARO', 0):.1f}%</td>
-                </tr>
-            """
-            rows.append(row)
-
-        return ''.join(rows)
+        brands = self._limit_rows(brands_df, 'marcas')
+        diff_simple = column(brands, 'price_diff_media_simple', 0)
+        diff_ponderada = column(brands, 'price_diff_media_ponderada', 0)
+
+        # Porcentaje de clics por segmento (diccionario por marca)
+        segments = pd.DataFrame(
+            [value if isinstance(value, dict) else {} for value in column(brands, 'segmentos')],
+            columns=PRICE_SEGMENTS
+        ).fillna(0)
+
+        cells = [
+            td('<strong>' + text(column(brands, 'marca', 'N/A')) + '</strong>'),
+            td(number(column(brands, 'clics_totales', 0), ',', integer=True)),
+            td(number(column(brands, 'productos', 0), 'd', integer=True)),
+            td(number(diff_simple, '+.2f', '%'), price_class(diff_simple)),
+            td(number(diff_ponderada, '+.2f', '%'), price_class(diff_ponderada))
+        ]
+        cells += [td(number(segments[segment], '.1f', '%'), SEGMENT_CSS_CLASSES[segment]) for segment in PRICE_SEGMENTS]
+        return rows(cells, len(brands))
+
+    def _top_products(self, metrics: Dict, enriched_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Productos de la tabla de top productos: los de las métricas o, si el
+        límite de la tabla pide más, los de más clics de los datos enriquecidos
+        """
+        top_products = metrics['top_productos']
+        limit = self.table_limits.get('productos')
+        if top_products is not None and limit is not None and limit <= len(top_products):
+            return top_products.head(limit)
+        if enriched_data is None or len(enriched_data) == 0:
+            return top_products
+        return top_rows(enriched_data, limit if limit is not None else len(enriched_data), 'Clics')
 
     def _generate_top_products_rows(self, top_products: pd.DataFrame) -> str:
         """Genera filas HTML para tabla de top productos"""
         if top_products is None or len(top_products) == 0:
             return '<tr><td colspan="14">No hay datos disponibles</td></tr>'
 
-        rows = []
-        for _, product in top_products.iterrows():
-            product_link = product.get('link', '#')
-
-            # Extraer información enriquecida si está disponible
-            medida = product.get('medida_final', 'N/A')
-            temporada = product.get('temporada_limpia', 'N/A')
-            vehiculo = product.get('vehiculo_final', 'N/A')
-
-            # Manejar valores nulos con defaults seguros
-            producto_id = product.get('ID de producto', 'N/A')
-            titulo = str(product.get('Título', 'N/A'))
-            marca = product.get('Marca', 'N/A')
-
-            row = f"""
-                <tr>
-                    <td>{producto_id}</td>
-                    <td title="{titulo}">
-                        {titulo[:60]}{'...' if len(titulo) > 60 else ''}
-                    </td>
-                    <td>{marca}</td>
-                    <td>{product.get('category_inferred', 'N/A')}</td>
-                    <td>{medida}</td>
-                    <td>{temporada}</td>
-                    <td>{vehiculo}</td>
-                    <td>{float(product.get('Tu precio', 0) or 0):.2f}€</td>
-                    <td>{float(product.get('Referencia', 0) or 0):.2f}€</td>
-                    <td class="price-{self._get_price_class(float(product.get('price_diff_pct', 0) or 0))}">
-                        {float(product.get('price_diff_pct', 0) or 0):+.2f}%
-                    </td>
-                    <td><span class="badge bg-{self._get_segment_color(product.get('segmento_precio', 'N/A'))}">
-                        {product.get('segmento_precio', 'N/A')}
-                    </span></td>
-                    <td>{int(product.get('Clics', 0) or 0):,}</td>
-                    <td><a href="{product_link}" target="_blank" class="btn btn-sm btn-outline-primary">
-                        <i class="fas fa-external-link-alt"></i>
-                    </a></td>
-                </tr>
-            """
-            rows.append(row)
-
-        return ''.join(rows)
-
-    def _generate_temporadas_section(self, temporadas_df: pd.DataFrame) -> str:
-        """Genera sección de análisis por temporadas"""
-        if temporadas_df is None or len(temporadas_df) == 0:
+        titulos = column(top_products, 'Título', 'N/A')
+        diff = column(top_products, 'price_diff_pct', 0)
+        segmentos = column(top_products, 'segmento_precio', 'N/A').astype(object)
+        colores = segmentos.map(SEGMENT_BADGE_COLORS).fillna('secondary').to_numpy(dtype=object)
+
+        cells = [
+            td(text(column(top_products, 'ID de producto', 'N/A'))),
+            td(text(titulos, 60), title=text(titulos)),
+            td(text(column(top_products, 'Marca', 'N/A'))),
+            td(text(column(top_products, 'category_inferred', 'N/A'))),
+            td(text(column(top_products, 'medida_final', 'N/A'))),
+            td(text(column(top_products, 'temporada_limpia', 'N/A'))),
+            td(text(column(top_products, 'vehiculo_final', 'N/A'))),
+            td(number(column(top_products, 'Tu precio', 0), '.2f', '€')),
+            td(number(column(top_products, 'Referencia', 0), '.2f', '€')),
+            td(number(diff, '+.2f', '%'), price_class(diff)),
+            td('<span class="badge bg-' + colores + '">' + text(segmentos) + '</span>'),
+            td(number(column(top_products, 'Clics', 0), ',', integer=True)),
+            td('<a href="' + text(column(top_products, 'link', '#')) +
+               '" target="_blank" class="btn btn-sm btn-outline-primary"><i class="fas fa-external-link-alt"></i></a>')
+        ]
+        return rows(cells, len(top_products))
+
+    def _generate_all_products_section(self, enriched_data: pd.DataFrame) -> str:
+        """
+        Sección con todos los productos (solo con embed_products): los datos
+        van una sola vez como JSON columnar comprimido y la tabla se construye
+        en el navegador (ver ALL_PRODUCTS_SCRIPT). Si se fija un límite para
+        la tabla 'todos' solo se incluyen los de más clics
+        """
+        if not self.embed_products or enriched_data is None or len(enriched_data) == 0:
             return ""
 
-        rows = []
-        for _, temporada in temporadas_df.iterrows():
-            row = f"""
-                <tr>
-                    <td><strong>{temporada['temporada']}</strong></td>
-                    <td>{temporada['clics_totales']:,}</td>
-                    <td>{temporada['productos']}</td>
-                    <td class="price-{self._get_price_class(temporada['price_diff_media_ponderada'])}">
-                        {temporada['price_diff_media_ponderada']:+.2f}%
-                    </td>
-                </tr>
-            """
-            rows.append(row)
+        products = enriched_data
+        title = f"Todos los Productos ({len(enriched_data):,})"
+        limit = self.table_limits.get('todos')
+        if limit is not None and len(enriched_data) > limit:
+            products = top_rows(enriched_data, limit, 'Clics')
+            title = f"Productos con más clics ({limit:,} de {len(enriched_data):,})"
+
+        segment_options = ''.join(
+            f'<option value="{segment}">{self._format_segment_label(segment)}</option>' for segment in PRICE_SEGMENTS
+        )
 
         return f"""
-            <div class="table-container">
-                <h3 class="section-title"><i class="fas fa-calendar-alt me-2"></i>Análisis por Temporadas</h3>
-                <table class="table table-striped">
-                    <thead>
-                        <tr>
-                            <th>Temporada</th>
-                            <th>Clics Totales</th>
-                            <th>Productos</th>
-                            <th>Diferencia Precio Ponderada</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {''.join(rows)}
-                    </tbody>
-                </table>
+        <div class="table-container">
+            <h3 class="section-title"><i class="fas fa-list me-2"></i>{title}</h3>
+            <div class="mb-3">
+                <label for="allProductsSegment" class="form-label">Segmento de precio</label>
+                <select id="allProductsSegment" class="form-select form-select-sm w-auto">
+                    <option value="">Todos</option>
+                    {segment_options}
+                </select>
             </div>
+            <p id="allProductsStatus" class="text-muted"><i class="fas fa-spinner fa-spin me-2"></i>Cargando productos...</p>
+            <table id="allProductsTable" class="table table-striped table-sm">
+                <thead>
+                    <tr>
+                        <th>ID</th>
+                        <th>Producto</th>
+                        <th>Marca</th>
+                        <th>Categoría</th>
+                        <th>Medida</th>
+                        <th>Temporada</th>
+                        <th>Vehículo</th>
+                        <th>Precio</th>
+                        <th>Referencia</th>
+                        <th>Diff. %</th>
+                        <th>Segmento</th>
+                        <th>Clics</th>
+                        <th>Link</th>
+                    </tr>
+                </thead>
+            </table>
+            <script id="productData" type="application/octet-stream">{encode_products(products)}</script>
+        </div>
         """
 
-    def _generate_vehiculos_section(self, vehiculos_df: pd.DataFrame) -> str:
-        """Genera sección de análisis por vehículos"""
-        if vehiculos_df is None or len(vehiculos_df) == 0:
+    def _generate_dimension_section(self, df: pd.DataFrame, label_column: str, title: str, icon: str,
+                                    header: str, table_class: str = 'table table-striped',
+                                    limit_key: Optional[str] = None) -> str:
+        """
+        Sección con la tabla de un desglose por dimensión (temporadas,
+        vehículos, calidad, medidas, modelos): etiqueta, clics, productos y
+        diferencia ponderada
+        """
+        if df is None or len(df) == 0:
             return ""
 
-        rows = []
-        for _, vehiculo in vehiculos_df.iterrows():
-            row = f"""
-                <tr>
-                    <td><strong>{vehiculo['vehiculo']}</strong></td>
-                    <td>{vehiculo['clics_totales']:,}</td>
-                    <td>{vehiculo['productos']}</td>
-                    <td class="price-{self._get_price_class(vehiculo['price_diff_media_ponderada'])}">
-                        {vehiculo['price_diff_media_ponderada']:+.2f}%
-                    </td>
-                </tr>
-            """
-            rows.append(row)
+        if limit_key is not None:
+            df = self._limit_rows(df, limit_key)
+            title = title.format(n=len(df))
+
+        diff = df['price_diff_media_ponderada']
+        cells = [
+            td('<strong>' + text(df[label_column]) + '</strong>'),
+            td(number(df['clics_totales'], ',', integer=True)),
+            td(number(df['productos'], 'd', integer=True)),
+            td(number(diff, '+.2f', '%'), price_class(diff))
+        ]
 
         return f"""
             <div class="table-container">
-                <h3 class="section-title"><i class="fas fa-car me-2"></i>Análisis por Tipo de Vehículo</h3>
-                <table class="table table-striped">
+                <h3 class="section-title"><i class="fas {icon} me-2"></i>{title}</h3>
+                <table class="{table_class}">
                     <thead>
                         <tr>
-                            <th>Tipo de Vehículo</th>
+                            <th>{header}</th>
                             <th>Clics Totales</th>
                             <th>Productos</th>
                             <th>Diferencia Precio Ponderada</th>
                         </tr>
                     </thead>
                     <tbody>
-                        {''.join(rows)}
+                        {rows(cells, len(df))}
                     </tbody>
                 </table>
             </div>
         """
 
-    def _generate_quality_section(self, quality_df: pd.DataFrame) -> str:
-        """Genera sección de análisis por segmentos de calidad"""
-        if quality_df is None or len(quality_df) == 0:
-            return ""
+    def _generate_temporadas_section(self, temporadas_df: pd.DataFrame) -> str:
+        """Genera sección de análisis por temporadas"""
+        return self._generate_dimension_section(
+            temporadas_df, 'temporada', 'Análisis por Temporadas', 'fa-calendar-alt', 'Temporada'
+        )
 
-        rows = []
-        for _, quality in quality_df.iterrows():
-            row = f"""
-                <tr>
-                    <td><strong>{quality['quality']}</strong></td>
-                    <td>{quality['clics_totales']:,}</td>
-                    <td>{quality['productos']}</td>
-                    <td class="price-{self._get_price_class(quality['price_diff_media_ponderada'])}">
-                        {quality['price_diff_media_ponderada']:+.2f}%
-                    </td>
-                </tr>
-            """
-            rows.append(row)
+    def _generate_vehiculos_section(self, vehiculos_df: pd.DataFrame) -> str:
+        """Genera sección de análisis por vehículos"""
+        return self._generate_dimension_section(
+            vehiculos_df, 'vehiculo', 'Análisis por Tipo de Vehículo', 'fa-car', 'Tipo de Vehículo'
+        )
 
-        return f"""
-            <div class="table-container">
-                <h3 class="section-title"><i class="fas fa-star me-2"></i>Análisis por Segmento de Calidad</h3>
-                <table class="table table-striped">
-                    <thead>
-                        <tr>
-                            <th>Segmento</th>
-                            <th>Clics Totales</th>
-                            <th>Productos</th>
-                            <th>Diferencia Precio Ponderada</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {''.join(rows)}
-                    </tbody>
-                </table>
-            </div>
-        """
+    def _generate_quality_section(self, quality_df: pd.DataFrame) -> str:
+        """Genera sección de análisis por segmentos de calidad"""
+        return self._generate_dimension_section(
+            quality_df, 'quality', 'Análisis por Segmento de Calidad', 'fa-star', 'Segmento'
+        )
 
     def _generate_medidas_section(self, medidas_df: pd.DataFrame) -> str:
         """Genera sección de análisis por medidas"""
-        if medidas_df is None or len(medidas_df) == 0:
-            return ""
-
-        rows = []
-        for _, medida in medidas_df.head(20).iterrows():  # Top 20 medidas
-            row = f"""
-                <tr>
-                    <td><strong>{medida['medida']}</strong></td>
-                    <td>{medida['clics_totales']:,}</td>
-                    <td>{medida['productos']}</td>
-                    <td class="price-{self._get_price_class(medida['price_diff_media_ponderada'])}">
-                        {medida['price_diff_media_ponderada']:+.2f}%
-                    </td>
-                </tr>
-            """
-            rows.append(row)
-
-        return f"""
-            <div class="table-container">
-                <h3 class="section-title"><i class="fas fa-ruler me-2"></i>Top 20 Medidas por Clics</h3>
-                <table class="table table-striped table-sm">
-                    <thead>
-                        <tr>
-                            <th>Medida</th>
-                            <th>Clics Totales</th>
-                            <th>Productos</th>
-                            <th>Diferencia Precio Ponderada</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {''.join(rows)}
-                    </tbody>
-                </table>
-            </div>
-        """
+        return self._generate_dimension_section(
+            medidas_df, 'medida', 'Top {n} Medidas por Clics', 'fa-ruler', 'Medida',
+            table_class='table table-striped table-sm', limit_key='medidas'
+        )
 
     def _generate_modelos_section(self, modelos_df: pd.DataFrame) -> str:
         """Genera sección de análisis por modelos"""
-        if modelos_df is None or len(modelos_df) == 0:
+        return self._generate_dimension_section(
+            modelos_df, 'modelo', 'Top {n} Modelos por Clics', 'fa-cog', 'Modelo',
+            table_class='table table-striped table-sm', limit_key='modelos'
+        )
+
+    def _generate_product_list_section(self, products: pd.DataFrame, limit_key: str, price_css: str,
+                                       title: str, icon: str, title_class: str) -> str:
+        """Sección con una lista corta de productos (riesgo u oportunidades)"""
+        if products is None or len(products) == 0:
             return ""
 
-        rows = []
-        for _, modelo in modelos_df.head(15).iterrows():  # Top 15 modelos
-            row = f"""
-                <tr>
-                    <td><strong>{modelo['modelo']}</strong></td>
-                    <td>{modelo['clics_totales']:,}</td>
-                    <td>{modelo['productos']}</td>
-                    <td class="price-{self._get_price_class(modelo['price_diff_media_ponderada'])}">
-                        {modelo['price_diff_media_ponderada']:+.2f}%
-                    </td>
-                </tr>
-            """
-            rows.append(row)
+        products = self._limit_rows(products, limit_key)
+        cells = [
+            td(text(products['ID de producto'])),
+            td(text(products['Título'].astype(str).str.slice(0, 50)) + '...'),
+            td(text(products['Marca'])),
+            td(number(products['price_diff_pct'], '+.2f', '%'), price_css),
+            td(number(products['Clics'], ',', integer=True))
+        ]
 
         return f"""
             <div class="table-container">
-                <h3 class="section-title"><i class="fas fa-cog me-2"></i>Top 15 Modelos por Clics</h3>
-                <table class="table table-striped table-sm">
-                    <thead>
-                        <tr>
-                            <th>Modelo</th>
-                            <th>Clics Totales</th>
-                            <th>Productos</th>
-                            <th>Diferencia Precio Ponderada</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {''.join(rows)}
-                    </tbody>
-                </table>
-            </div>
-        """
-
-    def _get_segment_color(self, segment: str) -> str:
-        """Devuelve color Bootstrap para segmento"""
-        colors = {
-            'MUCHO_MAS_BARATO': 'success',
-            'BARATO': 'success',
-            'ALINEADO': 'secondary',
-            'CARO': 'warning',
-            'MUCHO_MAS_CARO': 'danger'
-        }
-        return colors.get(segment, 'secondary')
-
-    def _generate_risk_products_section(self, risk_products: pd.DataFrame) -> str:
-        """Genera sección de productos de riesgo"""
-        if risk_products is None or len(risk_products) == 0:
-            return ""
-
-        rows = []
-        for _, product in risk_products.head(10).iterrows():
-            row = f"""
-                <tr>
-                    <td>{product['ID de producto']}</td>
-                    <td>{product['Título'][:50]}...</td>
-                    <td>{product['Marca']}</td>
-                    <td class="price-negative">{product['price_diff_pct']:+.2f}%</td>
-                    <td>{product['Clics']:,}</td>
-                </tr>
-            """
-            rows.append(row)
-
-        return f"""
-            <div class="table-container">
-                <h3 class="section-title text-danger">
-                    <i class="fas fa-exclamation-triangle me-2"></i>Productos de Riesgo (Caros con muchos clics)
+                <h3 class="section-title {title_class}">
+                    <i class="fas {icon} me-2"></i>{title}
                 </h3>
                 <table class="table table-striped table-sm">
                     <thead>
@@ -857,51 +943,25 @@ class ReportGenerator:
                         </tr>
                     </thead>
                     <tbody>
-                        {''.join(rows)}
+                        {rows(cells, len(products))}
                     </tbody>
                 </table>
             </div>
         """
 
+    def _generate_risk_products_section(self, risk_products: pd.DataFrame) -> str:
+        """Genera sección de productos de riesgo"""
+        return self._generate_product_list_section(
+            risk_products, 'riesgo', 'price-negative',
+            'Productos de Riesgo (Caros con muchos clics)', 'fa-exclamation-triangle', 'text-danger'
+        )
+
     def _generate_opportunities_section(self, opportunities: pd.DataFrame) -> str:
         """Genera sección de oportunidades"""
-        if opportunities is None or len(opportunities) == 0:
-            return ""
-
-        rows = []
-        for _, product in opportunities.head(10).iterrows():
-            row = f"""
-                <tr>
-                    <td>{product['ID de producto']}</td>
-                    <td>{product['Título'][:50]}...</td>
-                    <td>{product['Marca']}</td>
-                    <td class="price-positive">{product['price_diff_pct']:+.2f}%</td>
-                    <td>{product['Clics']:,}</td>
-                </tr>
-            """
-            rows.append(row)
-
-        return f"""
-            <div class="table-container">
-                <h3 class="section-title text-success">
-                    <i class="fas fa-lightbulb me-2"></i>Oportunidades (Baratos con muchos clics)
-                </h3>
-                <table class="table table-striped table-sm">
-                    <thead>
-                        <tr>
-                            <th>ID</th>
-                            <th>Producto</th>
-                            <th>Marca</th>
-                            <th>Diferencia %</th>
-                            <th>Clics</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {''.join(rows)}
-                    </tbody>
-                </table>
-            </div>
-        """
+        return self._generate_product_list_section(
+            opportunities, 'oportunidades', 'price-positive',
+            'Oportunidades (Baratos con muchos clics)', 'fa-lightbulb', 'text-success'
+        )
 
     def _generate_conclusions(self, metrics: Dict) -> str:
         """Genera conclusiones del análisis"""
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Índice para re-segmentar los productos por diferencia de precio sin reprocesar
+Ordena los productos por price_diff_pct (en global y dentro de cada marca) y
+guarda los clics acumulados, de modo que la distribución de clics por segmento
+para cualquier juego de umbrales se obtiene con búsquedas binarias
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from pricing_analyzer import PRICE_SEGMENTS, PRICE_SEGMENT_THRESHOLDS
+from partial_metrics import click_counts
+
+class SegmentationIndex:
+    """
+    Distribución de clics acumulada por diferencia de precio. Los segmentos
+    siguen las reglas de _segment_prices: <= t0, <= t1, < t2, < t3 y el resto;
+    los productos sin diferencia (NaN) cuentan en el último segmento
+    """
+
+    def __init__(self, df: pd.DataFrame, brand_column: str = 'Marca'):
+        diff = df['price_diff_pct'].to_numpy(dtype='float64', na_value=np.nan)
+        clicks = click_counts(df).to_numpy(dtype='float64', na_value=np.nan)
+        clicks = np.nan_to_num(clicks)
+        valid = ~np.isnan(diff)
+
+        # Índice global: diferencias ordenadas y clics acumulados (con 0 inicial)
+        order = np.argsort(diff[valid], kind='mergesort')
+        self.values = diff[valid][order]
+        self.cum_clicks = np.concatenate([[0], np.cumsum(clicks[valid][order])])
+        self.total_clicks = clicks.sum()
+        self.missing_rows = int((~valid).sum())
+        self.missing_clicks = clicks[~valid].sum()
+
+        # Índice por marca: filas ordenadas por (marca, diferencia) con la
+        # diferencia sustituida por su rango entre los valores distintos, para
+        # buscar todas las marcas a la vez en una sola clave entera
+        brands = pd.Categorical(df[brand_column]) if brand_column in df.columns \
+            else pd.Categorical([np.nan] * len(df))
+        self.brands = brands.categories
+        codes = brands.codes.astype('int64')
+
+        self.unique_values = np.unique(self.values)
+        rank_span = len(self.unique_values) + 1
+        branded = valid & (codes >= 0)
+        ranks = np.searchsorted(self.unique_values, diff[branded])
+        keys = codes[branded] * rank_span + ranks
+        brand_order = np.argsort(keys, kind='mergesort')
+
+        self.rank_span = rank_span
+        self.brand_keys = keys[brand_order]
+        self.brand_cum_clicks = np.concatenate([[0], np.cumsum(clicks[branded][brand_order])])
+
+        # Filas y clics sin diferencia por marca (van al último segmento)
+        n_brands = len(self.brands)
+        missing = ~valid & (codes >= 0)
+        self.brand_missing_rows = np.bincount(codes[missing], minlength=n_brands)
+        self.brand_missing_clicks = np.bincount(codes[missing], weights=clicks[missing], minlength=n_brands)
+        self.brand_clicks = np.bincount(codes[codes >= 0], weights=clicks[codes >= 0], minlength=n_brands)
+
+    def segment_totals(self, thresholds: Sequence[float] = PRICE_SEGMENT_THRESHOLDS) -> pd.DataFrame:
+        """Productos y clics de cada segmento (todos los segmentos, también vacíos)"""
+        rows, clicks = self._segment_counts(thresholds)
+        return pd.DataFrame({'productos': rows, 'clics': clicks}, index=pd.Index(PRICE_SEGMENTS, name='segmento'))
+
+    def distribution(self, thresholds: Sequence[float] = PRICE_SEGMENT_THRESHOLDS) -> Dict[str, float]:
+        """
+        Porcentaje de clics por segmento con los umbrales dados; mismo formato
+        que metrics['globales']['segmento_distribucion'] (solo segmentos con
+        productos)
+        """
+        rows, clicks = self._segment_counts(thresholds)
+        shares = np.round(clicks / self.total_clicks * 100, 1)
+        return {segment: float(share) for segment, share, n in zip(PRICE_SEGMENTS, shares, rows) if n > 0}
+
+    def brand_shares(self, thresholds: Sequence[float] = PRICE_SEGMENT_THRESHOLDS) -> pd.DataFrame:
+        """
+        Porcentaje de los clics de cada marca en cada segmento, con las marcas
+        como filas ordenadas por clics y una columna clics_totales
+        """
+        n_brands = len(self.brands)
+        if n_brands == 0:
+            return pd.DataFrame(columns=['clics_totales'] + PRICE_SEGMENTS)
+
+        # Posición de cada umbral dentro del bloque de cada marca
+        brand_ids = np.arange(n_brands)
+        starts = np.searchsorted(self.brand_keys, brand_ids * self.rank_span)
+        ends = np.searchsorted(self.brand_keys, (brand_ids + 1) * self.rank_span)
+        rank_bounds = self._bounds(self.unique_values, thresholds)
+        bounds = np.searchsorted(self.brand_keys, brand_ids[:, None] * self.rank_span + rank_bounds[None, :])
+        positions = np.column_stack([starts, bounds, ends])
+
+        clicks = np.diff(self.brand_cum_clicks[positions], axis=1)
+        clicks[:, -1] += self.brand_missing_clicks
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.round(clicks / self.brand_clicks[:, None] * 100, 1)
+
+        result = pd.DataFrame(shares, index=pd.Index(self.brands, name='marca'), columns=PRICE_SEGMENTS)
+        result.insert(0, 'clics_totales', self.brand_clicks)
+        return result.sort_values('clics_totales', ascending=False, kind='mergesort')
+
+    def _segment_counts(self, thresholds: Sequence[float]):
+        """Filas y clics por segmento a partir de las posiciones de los umbrales"""
+        positions = np.concatenate([[0], self._bounds(self.values, thresholds), [len(self.values)]])
+        rows = np.diff(positions)
+        clicks = np.diff(self.cum_clicks[positions])
+        rows[-1] += self.missing_rows
+        clicks[-1] += self.missing_clicks
+        return rows, clicks
+
+    def _bounds(self, values: np.ndarray, thresholds: Sequence[float]) -> np.ndarray:
+        """
+        Posición en values (ordenados) de cada límite de segmento. El segmento
+        de _segment_prices es el número de condiciones que se cumplen, así que
+        con umbrales repetidos los límites se ordenan (p. ej. con barato =
+        alineado, el valor exacto cae en ALINEADO)
+        """
+        low, cheap, aligned, expensive = self._validate(thresholds)
+        return np.sort(np.concatenate([
+            np.searchsorted(values, [low, cheap], side='right'),
+            np.searchsorted(values, [aligned, expensive], side='left')
+        ]))
+
+    def _validate(self, thresholds: Sequence[float]) -> Sequence[float]:
+        if len(thresholds) != len(PRICE_SEGMENTS) - 1:
+            raise ValueError(f"Se necesitan {len(PRICE_SEGMENTS) - 1} umbrales de segmento")
+        if list(thresholds) != sorted(thresholds):
+            raise ValueError("Los umbrales de segmento deben ser crecientes")
+        return thresholds
@@ -0,0 +1,60 @@
+"""Exportación CSV del dataset enriquecido tal como la genera el panel"""
+
+import io
+import logging
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_dataset
+from feed_cache import FeedCache
+
+# Cabecera de la exportación antes de la proyección de columnas del feed
+# (mismo dataset sintético: 300 items, 80% de match)
+BASELINE_EXPORT_COLUMNS = [
+    'ID de producto', 'Título', 'Marca', 'Tu precio', 'Referencia', 'Diferencia de precios', 'Clics',
+    'price_diff_pct', 'segmento_precio', 'title', 'description', 'link', 'image_link', 'availability',
+    'price', 'sale_price', 'brand', 'gtin', 'mpn', 'section_general_medida', 'section_general_modelo',
+    'section_general_temporada', 'section_general_vehículo', 'custom_label_2', 'custom_label_3',
+    'custom_label_4', 'custom_label_5', 'dimensions', 'pattern', 'category_inferred', 'vehicle_type',
+    'season', 'price_num', 'price_currency', 'sale_price_num', 'sale_price_currency', 'brand_standardized',
+    'medida_limpia', 'modelo_limpio', 'temporada_limpia', 'vehiculo_limpio', 'vehiculo_custom',
+    'segmento_quality', 'medida_dimensions', 'medida_final', 'vehiculo_final', 'marca_final',
+    'impacto_clicks', 'precio_ajustado'
+]
+
+@pytest.fixture
+def dataset():
+    return generate_dataset(300, match_rate=0.8)
+
+@pytest.fixture
+def exported(tmp_path, monkeypatch, dataset):
+    """CSV exportado por las etapas del panel para el dataset sintético"""
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    app = pytest.importorskip('app')
+    monkeypatch.setattr(app, 'get_feed_cache', lambda: FeedCache(str(tmp_path / 'cache')))
+
+    csv_content, xml_content = dataset
+    inputs = (f'csv-{tmp_path.name}', f'feed-{tmp_path.name}')
+    enriched, _, _, _ = app.analysis_stage(*inputs, False, io.BytesIO(csv_content.encode('utf-8')),
+                                           io.BytesIO(xml_content))
+    data = app.export_csv_stage(*inputs, enriched, '2026-01-01')
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+
+def test_export_keeps_all_feed_columns(exported):
+    assert set(exported.columns) - {'report_date'} == set(BASELINE_EXPORT_COLUMNS)
+
+def test_export_keeps_price_precision(exported, dataset):
+    """Precios y valores derivados con la precisión de float64, sin ruido de float32"""
+    source = pd.read_csv(io.StringIO(dataset[0]), skiprows=2, dtype=str)
+    assert exported['ID de producto'].tolist() == source['ID de producto'].tolist()
+
+    for column in ('Tu precio', 'Referencia'):
+        assert (exported[column].astype(float) == source[column].astype(float)).all()
+        assert (exported[column].str.len() <= source[column].str.len()).all()
+
+    expected = [
+        repr(float(price) * (1 + float(diff)))
+        for price, diff in zip(source['Tu precio'], source['Diferencia de precios'])
+    ]
+    assert exported['precio_ajustado'].tolist() == expected
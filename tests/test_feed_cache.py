@@ -0,0 +1,29 @@
+"""Caché de feeds parseados: clave de contenido calculada por el llamador"""
+
+import contextlib
+import io
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_feed_xml
+from feed_cache import FeedCache
+from pricing_analyzer import PricingAnalyzer
+
+def test_feed_uses_precomputed_content_key(tmp_path, monkeypatch):
+    feed = generate_feed_xml(50)
+    cache = FeedCache(str(tmp_path))
+    content_key = cache.fingerprint(feed)
+
+    def fail(content):
+        raise AssertionError("el feed no debe volver a recorrerse para calcular su huella")
+
+    monkeypatch.setattr(cache, 'fingerprint', fail)
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        parsed = PricingAnalyzer(feed_cache=cache).parse_product_feed_xml(feed, content_key=content_key)
+        cached = PricingAnalyzer(feed_cache=cache).parse_product_feed_xml(b'', content_key=content_key)
+
+    assert cache.get(content_key) is not None
+    assert 'cargado desde caché' in output.getvalue()
+    pd.testing.assert_index_equal(cached.index, parsed.index)
+    assert list(cached.columns) == list(parsed.columns)
@@ -0,0 +1,73 @@
+"""Parseo del feed de productos: entidades XML no resueltas y parseo en paralelo"""
+
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_feed_xml
+from pricing_analyzer import PricingAnalyzer
+
+def _feed_with_entities(secret_path) -> bytes:
+    return f'''<?xml version="1.0"?>
+<!DOCTYPE rss [
+  <!ENTITY secreto SYSTEM "file://{secret_path}">
+  <!ENTITY a "AAAAAAAAAA">
+  <!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;&a;&a;">
+  <!ENTITY c "&b;&b;&b;&b;&b;&b;&b;&b;&b;&b;">
+]>
+<rss xmlns:g="http://base.google.com/ns/1.0"><channel>
+<item><g:id>SKU-1</g:id><g:title>&secreto;</g:title><g:brand>&c;</g:brand></item>
+<item><g:id>SKU-2</g:id><g:title>Neumático 205/55 R16</g:title><g:brand>Marca</g:brand></item>
+</channel></rss>'''.encode('utf-8')
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_feed_does_not_resolve_entities(tmp_path, monkeypatch, workers):
+    secret = tmp_path / 'secret.txt'
+    secret.write_text('CONTENIDO_PRIVADO')
+    feed = _feed_with_entities(secret)
+
+    # Rangos pequeños para que con workers=2 se use el parseo en paralelo
+    monkeypatch.setattr('pricing_analyzer.FEED_MIN_RANGE_BYTES', 1)
+
+    analyzer = PricingAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = analyzer.parse_product_feed_xml(feed, workers=workers)
+
+    assert len(df) == 2
+    values = df.astype(str).to_numpy().ravel().tolist()
+    assert not any('CONTENIDO_PRIVADO' in value for value in values)
+    assert all(len(value) < 100 for value in values)
+
+def _feed_source(feed: bytes, source: str, tmp_path):
+    if source == 'str':
+        return feed.decode('utf-8')
+    if source == 'buffer':
+        return io.BytesIO(feed)
+    if source == 'file':
+        path = tmp_path / 'feed.xml'
+        path.write_bytes(feed)
+        return open(path, 'rb')
+    return feed
+
+@pytest.mark.parametrize('source', ['bytes', 'str', 'buffer', 'file'])
+def test_parallel_feed_matches_sequential(tmp_path, monkeypatch, source):
+    feed = generate_feed_xml(500)
+    monkeypatch.setattr('pricing_analyzer.FEED_MIN_RANGE_BYTES', 1)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sequential = PricingAnalyzer().parse_product_feed_xml(feed)
+
+    content = _feed_source(feed, source, tmp_path)
+    analyzer = PricingAnalyzer()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        parallel = analyzer.parse_product_feed_xml(content, workers=2)
+    if hasattr(content, 'close'):
+        content.close()
+
+    # Sin volver al parseo secuencial
+    assert 'secuencial' not in output.getvalue()
+    pd.testing.assert_frame_equal(parallel, sequential)
+    assert analyzer.feed_items_read == 500
@@ -0,0 +1,28 @@
+"""Medidas de las etapas del análisis (profiling)"""
+
+import contextlib
+import io
+
+from benchmarks.synthetic import generate_dataset
+from pricing_analyzer import PricingAnalyzer
+from profiling import RunProfile
+
+def run_twice(analyzer):
+    csv_content, xml_content = generate_dataset(50, match_rate=0.8)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(2):
+            analyzer.parse_competitiveness_csv(csv_content)
+            analyzer.parse_product_feed_xml(xml_content)
+            analyzer.enrich_data()
+            analyzer.calculate_metrics()
+
+def test_analyzer_without_profile_does_not_record_stages():
+    analyzer = PricingAnalyzer()
+    run_twice(analyzer)
+    assert analyzer.profile is None
+
+def test_analyzer_records_stages_in_given_profile():
+    profile = RunProfile()
+    analyzer = PricingAnalyzer(profile=profile)
+    run_twice(analyzer)
+    assert [stage.stage for stage in profile.stages] == ['csv', 'feed', 'enriquecimiento', 'metricas'] * 2
@@ -0,0 +1,36 @@
+"""Tabla de productos embebidos en el informe HTML (embed_products)"""
+
+import re
+
+from benchmarks.synthetic import generate_dataset
+from pricing_analyzer import PricingAnalyzer
+from product_payload import decode_products
+from report_generator import ReportGenerator
+
+def embedded_products(html):
+    return decode_products(re.search(r'<script id="productData"[^>]*>([^<]*)</script>', html).group(1))
+
+def analyze():
+    csv_content, xml_content = generate_dataset(300, match_rate=0.8)
+    analyzer = PricingAnalyzer()
+    analyzer.parse_competitiveness_csv(csv_content)
+    analyzer.parse_product_feed_xml(xml_content)
+    enriched = analyzer.enrich_data()
+    return enriched, analyzer.calculate_metrics(), analyzer.date_range
+
+def test_embedded_products_capped_by_clicks():
+    enriched, metrics, date_range = analyze()
+    generator = ReportGenerator(embed_products=True, table_limits={'todos': 25})
+    products = embedded_products(generator.generate_html_report(metrics, date_range, enriched))
+
+    assert len(products) == 25
+    expected = enriched['Clics'].sort_values(ascending=False).head(25)
+    assert sorted(products['Clics'], reverse=True) == expected.tolist()
+
+def test_embedded_products_all_by_default():
+    enriched, metrics, date_range = analyze()
+    generator = ReportGenerator(embed_products=True)
+    html = generator.generate_html_report(metrics, date_range, enriched)
+
+    assert len(embedded_products(html)) == len(enriched)
+    assert f"Todos los Productos ({len(enriched):,})" in html
@@ -0,0 +1,33 @@
+"""Inferencia de categoría, vehículo y temporada desde el título"""
+
+import numpy as np
+import pandas as pd
+
+from pricing_analyzer import PricingAnalyzer
+
+def test_title_inference_priority_and_missing_titles():
+    titles = pd.Series([
+        'Neumático SUV Turismo Winter',
+        'neumático suv turismo winter',
+        'Neumático Van 4 Estaciones',
+        'Neumático Van 4 Estaciones',
+        'Neumático Moto Summer',
+        'Neumático Genérico',
+        '',
+        None,
+    ], index=[10, 11, 12, 13, 14, 15, 16, 17], dtype=object)
+
+    inferred = PricingAnalyzer()._infer_from_titles(titles)
+
+    assert inferred['category_inferred'].tolist()[:6] == ['turismo', 'turismo', 'furgoneta', 'furgoneta', 'moto', 'otro']
+    assert inferred['vehicle_type'].tolist()[:6] == ['coche', 'coche', 'desconocido', 'desconocido',
+                                                     'desconocido', 'desconocido']
+    assert inferred['season'].tolist()[:6] == ['invierno', 'invierno', 'all_season', 'all_season', 'verano',
+                                               'desconocida']
+    for values in inferred.values():
+        assert list(values.index) == list(titles.index)
+        assert values.iloc[6:].isna().all()
+
+def test_title_inference_without_titles():
+    inferred = PricingAnalyzer()._infer_from_titles(pd.Series([None, np.nan], dtype=object))
+    assert all(values.isna().all() and len(values) == 2 for values in inferred.values())